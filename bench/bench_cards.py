@@ -0,0 +1,181 @@
+"""
+Nifty Brief — Card Rendering Benchmark
+Renders both cards from the fixture data.json variants in bench/fixtures and
+reports per-phase time and peak traced memory, without any credentials.
+
+  python bench/bench_cards.py                      # compare against bench/baseline.json
+  python bench/bench_cards.py --update-baseline    # store this machine's numbers
+  python bench/bench_cards.py --profile jpeg --runs 10 --threshold 0.3
+
+Phases: bg (background + cached chrome copy), panels (rounded-rect compositing),
+text (the rest of the render) and encode. "cold" is the first render with empty
+background/chrome caches, "warm" the median of the following runs. "RSS KiB"
+is the max RSS of a fresh interpreter that renders the case once, cold; Pillow's
+image buffers live outside the Python heap, so tracemalloc's "py KiB" misses them.
+Exits 1 when a warm phase is slower than baseline * (1 + threshold) by more
+than --min-ms, or the max RSS grows past the threshold by more than --min-kib.
+
+Needs the real card fonts (FONT_FILES in card_generator.py): if any of them
+falls back to PIL's bitmap font the numbers mean nothing, so the run exits 2
+without recording or comparing. The baseline stores a hash of each font file
+and is only compared against runs on the same fonts.
+"""
+
+import os, sys, json, time, glob, hashlib, shutil, argparse, resource, subprocess, tempfile, tracemalloc, statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import card_generator as cg
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES  = os.path.join(BENCH_DIR, "fixtures")
+BASELINE  = os.path.join(BENCH_DIR, "baseline.json")
+PHASES    = ["bg", "panels", "text", "encode"]
+
+def font_hashes():
+    """{face: sha256 prefix of its font file}, so baselines stay tied to the fonts they ran on."""
+    out = {}
+    for face, path in sorted(cg.FONT_FILES.items()):
+        with open(path, "rb") as f:
+            out[face] = hashlib.sha256(f.read()).hexdigest()[:16]
+    return out
+
+def run_once(template, data, profile):
+    """One render + encode; returns {phase: ms, "total": ms}."""
+    cg.PHASE_TIMES = {}
+    t0  = time.perf_counter()
+    img = cg.TEMPLATES[template](data, "session_1")
+    t1  = time.perf_counter()
+    cg.encode(img, profile)
+    t2  = time.perf_counter()
+    ph  = cg.PHASE_TIMES
+    cg.PHASE_TIMES = None
+    render = t1 - t0
+    out = {
+        "bg":     ph.get("bg", 0.0),
+        "panels": ph.get("panels", 0.0),
+        "encode": t2 - t1,
+    }
+    out["text"]  = max(render - out["bg"] - out["panels"], 0.0)
+    out["total"] = t2 - t0
+    return {k: round(v*1000, 2) for k, v in out.items()}
+
+def peak_kib(template, data, profile):
+    tracemalloc.start()
+    cg.encode(cg.TEMPLATES[template](data, "session_1"), profile)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak // 1024
+
+def maxrss_kib():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss   # bytes on macOS, KiB elsewhere
+
+def rss_case(path, template, profile):
+    """Child mode: one cold render in a fresh process, then print its max RSS."""
+    with open(path) as f:
+        data = json.load(f)
+    cg.CACHE_DIR = tempfile.mkdtemp(prefix="nifty-bench-")
+    try:
+        cg.encode(cg.TEMPLATES[template](data, "session_1"), profile)
+        print(maxrss_kib())
+    finally:
+        shutil.rmtree(cg.CACHE_DIR, ignore_errors=True)
+
+def case_rss_kib(path, template, profile):
+    # ru_maxrss never goes down, so every case needs its own process
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--rss-case", path, template, profile],
+                         capture_output=True, text=True, check=True).stdout
+    return int(out.split()[-1])
+
+def bench(name, data, template, runs, profile):
+    # cold: empty in-memory caches and an empty on-disk cache dir
+    cg._bg_cache.clear()
+    cg._chrome_cache.clear()
+    cg.CACHE_DIR = tempfile.mkdtemp(prefix="nifty-bench-")
+    try:
+        cold = run_once(template, data, profile)
+        warm = [run_once(template, data, profile) for _ in range(runs)]
+    finally:
+        shutil.rmtree(cg.CACHE_DIR, ignore_errors=True)
+    med = {k: round(statistics.median(r[k] for r in warm), 2) for k in PHASES + ["total"]}
+    return {"cold_ms": cold["total"], "warm": med, "peak_kib": peak_kib(template, data, profile)}
+
+def main():
+    if sys.argv[1:2] == ["--rss-case"]:
+        rss_case(*sys.argv[2:5])
+        return 0
+    ap = argparse.ArgumentParser(description="Benchmark card rendering")
+    ap.add_argument("--runs", type=int, default=5, help="warm runs per case (median is reported)")
+    ap.add_argument("--profile", default="png", choices=sorted(cg.ENCODE_PROFILES))
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown per phase")
+    ap.add_argument("--min-ms", type=float, default=2.0, help="ignore slowdowns smaller than this")
+    ap.add_argument("--min-kib", type=int, default=4096, help="ignore max-RSS increases smaller than this")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--update-baseline", action="store_true")
+    args = ap.parse_args()
+
+    cg.warm_fonts([(face, 16) for face in cg.FONT_FILES])   # PRELOAD_FONTS skips unused faces
+    if cg._font_fallbacks:
+        print("Missing fonts, refusing to bench on PIL's default font:")
+        for path in sorted(cg._font_fallbacks):
+            print("  " + path)
+        return 2
+    fonts = font_hashes()
+
+    results = {}
+    print("case".ljust(28) + "".join(p.rjust(9) for p in PHASES) + "    total     cold   py KiB  RSS KiB")
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.json"))):
+        with open(path) as f:
+            data = json.load(f)
+        fixture = os.path.splitext(os.path.basename(path))[0]
+        for template in cg.TEMPLATES:
+            case = fixture + "/" + template
+            r    = bench(case, data, template, args.runs, args.profile)
+            r["rss_kib"] = case_rss_kib(path, template, args.profile)
+            results[case] = r
+            w = r["warm"]
+            print(case.ljust(28) + "".join(str(w[p]).rjust(9) for p in PHASES)
+                  + str(w["total"]).rjust(9) + str(r["cold_ms"]).rjust(9) + str(r["peak_kib"]).rjust(9)
+                  + str(r["rss_kib"]).rjust(9))
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"profile": args.profile, "fonts": fonts, "results": results}, f, indent=1, sort_keys=True)
+        print("Baseline written: " + args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline at " + args.baseline + " (run with --update-baseline to create one)")
+        return 0
+    with open(args.baseline) as f:
+        base = json.load(f)
+    if base.get("profile") != args.profile:
+        print("Baseline was recorded with profile " + str(base.get("profile")) + ", not compared")
+        return 0
+    if base.get("fonts") != fonts:
+        print("Baseline was recorded with different fonts, not compared (re-run with --update-baseline)")
+        return 2
+
+    failed = []
+    for case, r in results.items():
+        old = base["results"].get(case)
+        if not old:
+            continue
+        for p in PHASES:
+            now, was = r["warm"][p], old["warm"][p]
+            if now > was*(1+args.threshold) and now-was > args.min_ms:
+                failed.append(case + " " + p + ": " + str(was) + " -> " + str(now) + " ms")
+        now, was = r["rss_kib"], old.get("rss_kib")
+        if was is not None and now > was*(1+args.threshold) and now-was > args.min_kib:
+            failed.append(case + " RSS: " + str(was) + " -> " + str(now) + " KiB")
+    if failed:
+        print("REGRESSIONS (threshold " + str(int(args.threshold*100)) + "%):")
+        for line in failed:
+            print("  " + line)
+        return 1
+    print("No regressions against baseline (threshold " + str(int(args.threshold*100)) + "%)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,142 @@
 """
 Nifty Brief — Subscriber Broadcast
-Reads subscribers from Google Sheet, sends email + Telegram to each
+Reads subscribers from Google Sheet and fans them out to independent email and Telegram channels
 """
 
-import os, json, re, time, smtplib
+import os, sys, json, re, time, hmac, queue, base64, hashlib, sqlite3, smtplib, tempfile, threading, asyncio, http.client
 import urllib.request, urllib.parse
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from email.mime.nonmultipart import MIMENonMultipart
 from datetime import datetime, timezone, timedelta
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:   # no sealed state: full sheet read and a fresh token every run
+    Fernet, InvalidToken = None, ValueError
+
+# ── STATE ─────────────────────────────────────────────────────────────────────
+# Kept between runs by the workflow's .cache step, which any workflow run in the
+# repo can restore: no credentials or subscriber rows are written here in the
+# clear. The Sheets token and the subscriber snapshot are sealed with a key
+# derived from GOOGLE_SERVICE_ACCOUNT_JSON (see state_cipher).
+STATE_DIR          = os.environ.get("STATE_DIR", ".cache")
+SHEETS_TOKEN       = os.path.join(STATE_DIR, "sheets_token.sealed")
+SUBS_SNAPSHOT      = os.path.join(STATE_DIR, "subscribers.sealed")  # one sealed block of sheet rows per line
+SUBS_META          = os.path.join(STATE_DIR, "subscribers.json")    # sheet id, row and block count, last full sync
+SHEET_RESYNC_HOURS = float(os.environ.get("SHEET_RESYNC_HOURS", "24"))  # full re-read to pick up edits/deletes
+SHEET_BLOCK        = int(os.environ.get("SHEET_BLOCK", "2000"))           # rows per Sheets API request
+EMAIL_RE           = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+$")
+OUTBOX             = os.path.join(STATE_DIR, "outbox.sqlite")
+OUTBOX_CHECKPOINT  = int(os.environ.get("OUTBOX_CHECKPOINT", "25"))      # commit after this many updates...
+OUTBOX_CHECKPOINT_SECS = float(os.environ.get("OUTBOX_CHECKPOINT_SECS", "5"))  # ...or this many seconds
+OUTBOX_KEEP_DAYS   = 7
+
+# ── OUTBOX ────────────────────────────────────────────────────────────────────
+class Outbox:
+    """Delivery status per (day, session, channel, recipient) in SQLite.
+
+    Recipients are stored as an HMAC of the address under OUTBOX_KEY and
+    errors as a class or status code, so the cached file holds no addresses
+    or message text. Each status change is one statement under a lock;
+    changes are committed every OUTBOX_CHECKPOINT updates or
+    OUTBOX_CHECKPOINT_SECS seconds, so a killed run loses at most one
+    checkpoint of progress. A rerun of the same session only sends to
+    recipients not yet marked sent.
+    """
+
+    def __init__(self, path, day, session, key):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] < 2:
+            self.db.execute("DROP TABLE IF EXISTS outbox")   # older files held plain addresses
+            self.db.execute("PRAGMA user_version=2")
+            self.db.commit()
+            self.db.execute("VACUUM")   # and don't leave them in free pages
+        self.db.execute("CREATE TABLE IF NOT EXISTS outbox (day TEXT, session TEXT, channel TEXT,"
+                        " recipient TEXT, status TEXT, attempts INTEGER DEFAULT 0, error TEXT,"
+                        " run TEXT, updated REAL, PRIMARY KEY (day, session, channel, recipient))")
+        self.db.execute("DELETE FROM outbox WHERE updated < ?", (time.time() - OUTBOX_KEEP_DAYS*86400,))
+        self.db.commit()
+        self.day, self.session, self.key = day, session, key.encode()
+        self.run   = os.urandom(8).hex()
+        self.lock  = threading.Lock()
+        self.dirty = 0
+        self.stamp = time.monotonic()
+
+    def recipient(self, channel, address):
+        return hmac.new(self.key, (channel + ":" + str(address).lower()).encode(), hashlib.sha256).hexdigest()
+
+    def claim(self, channel, recipient):
+        """Record a recipient as pending for this run; False if this session
+        already reached it or this run has already claimed it. Rows left
+        failed, skipped or pending by an earlier run are claimed again."""
+        key = (self.day, self.session, channel, self.recipient(channel, recipient))
+        with self.lock:
+            cur = self.db.execute("INSERT OR IGNORE INTO outbox (day, session, channel, recipient, status, run, updated)"
+                                  " VALUES (?, ?, ?, ?, 'pending', ?, ?)", key + (self.run, time.time()))
+            if cur.rowcount != 1:
+                cur = self.db.execute("UPDATE outbox SET status='pending', run=?, updated=?"
+                                      " WHERE day=? AND session=? AND channel=? AND recipient=?"
+                                      " AND status!='sent' AND run!=?", (self.run, time.time()) + key + (self.run,))
+            if cur.rowcount != 1:
+                return False
+            self.changed()
+            return True
+
+    def mark(self, channel, recipient, status, error=""):
+        with self.lock:
+            self.db.execute("UPDATE outbox SET status=?, attempts=attempts+1, error=?, updated=?"
+                            " WHERE day=? AND session=? AND channel=? AND recipient=?",
+                            (status, error[:40], time.time(), self.day, self.session, channel,
+                             self.recipient(channel, recipient)))
+            self.changed()
+
+    def sent_since(self, channel, seconds):
+        """Messages this channel delivered in the last `seconds`, across sessions."""
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM outbox WHERE channel=? AND status='sent' AND updated>=?",
+                                   (channel, time.time() - seconds)).fetchone()[0]
+
+    def changed(self):
+        self.dirty += 1
+        if self.dirty >= OUTBOX_CHECKPOINT or time.monotonic() - self.stamp >= OUTBOX_CHECKPOINT_SECS:
+            self.db.commit()
+            self.dirty = 0
+            self.stamp = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
+
+def error_code(e):
+    """What the outbox keeps of an exception: its class and SMTP/HTTP code."""
+    code = getattr(e, "smtp_code", None) or getattr(e, "code", None)
+    return type(e).__name__ + (" " + str(code) if code else "")
+
+def outbox_report():
+    """Print delivery progress per session and channel from the outbox."""
+    if not os.path.exists(OUTBOX):
+        print("No outbox at " + OUTBOX)
+        return
+    db = sqlite3.connect(OUTBOX)
+    rows = db.execute("SELECT day, session, channel, status, COUNT(*) FROM outbox"
+                      " GROUP BY day, session, channel, status ORDER BY day DESC, session, channel").fetchall()
+    db.close()
+    groups = {}
+    for day, session, channel, status, count in rows:
+        groups.setdefault((day, session, channel), {})[status] = count
+    print("day".ljust(12) + "session".ljust(15) + "channel".ljust(10)
+          + "".join(s.rjust(9) for s in ("sent", "failed", "skipped", "pending")))
+    for (day, session, channel), c in groups.items():
+        print(day.ljust(12) + session.ljust(15) + channel.ljust(10)
+              + "".join(str(c.get(s, 0)).rjust(9) for s in ("sent", "failed", "skipped", "pending")))
+
+# python broadcast.py --report prints the outbox without sending anything
+if "--report" in sys.argv[1:]:
+    outbox_report()
+    sys.exit(0)
 
 # ── SECRETS ───────────────────────────────────────────────────────────────────
 GMAIL_USER            = os.environ["GMAIL_USER"]
@@ -16,6 +145,33 @@ TELEGRAM_BOT_TOKEN    = os.environ["TELEGRAM_BOT_TOKEN"]
 SHEET_ID              = os.environ["SHEET_ID"]
 SA_JSON               = os.environ["GOOGLE_SERVICE_ACCOUNT_JSON"]  # full JSON string
 DASHBOARD_URL         = "https://Sameerxceed.github.io/nifty-dashboard/"
+OUTBOX_KEY            = os.environ.get("OUTBOX_KEY") or GMAIL_APP_PASSWORD + TELEGRAM_BOT_TOKEN  # HMAC key for outbox recipients
+
+# ── SMTP ──────────────────────────────────────────────────────────────────────
+# Defaults are Gmail; point SMTP_HOST/PORT at a local stand-in with SMTP_SSL=0
+# and SMTP_AUTH=0 to test without sending mail.
+SMTP_HOST          = os.environ.get("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT          = int(os.environ.get("SMTP_PORT", "465"))
+SMTP_SSL           = os.environ.get("SMTP_SSL", "1") == "1"
+SMTP_AUTH          = os.environ.get("SMTP_AUTH", "1") == "1"
+SMTP_CONNECTIONS   = int(os.environ.get("SMTP_CONNECTIONS", "1"))    # authenticated sessions kept open
+SMTP_MAX_PER_CONN  = int(os.environ.get("SMTP_MAX_PER_CONN", "90"))  # reconnect after this many messages
+EMAIL_RATE         = float(os.environ.get("EMAIL_RATE", "1"))        # sustained messages/sec
+EMAIL_BURST        = int(os.environ.get("EMAIL_BURST", "5"))
+EMAIL_DAILY_LIMIT  = int(os.environ.get("EMAIL_DAILY_LIMIT", "500"))  # Gmail: 500 recipients/day (Workspace: 2000)
+EMAIL_CONCURRENCY  = int(os.environ.get("EMAIL_CONCURRENCY", str(SMTP_CONNECTIONS)))
+EMAIL_RETRIES      = int(os.environ.get("EMAIL_RETRIES", "2"))        # retries for transient SMTP errors
+
+# ── TELEGRAM ──────────────────────────────────────────────────────────────────
+TELEGRAM_API_URL   = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org")
+TG_RATE            = float(os.environ.get("TG_RATE", "28"))        # bot-wide budget, Telegram allows ~30/s
+TG_CHAT_INTERVAL   = float(os.environ.get("TG_CHAT_INTERVAL", "1")) # min seconds between messages to one chat
+TG_CONCURRENCY     = int(os.environ.get("TG_CONCURRENCY", "8"))     # requests in flight / connections kept open
+TG_RETRIES         = 3
+
+# ── CHANNELS ──────────────────────────────────────────────────────────────────
+CHANNEL_QUEUE      = int(os.environ.get("CHANNEL_QUEUE", "1000"))   # per-channel backlog kept in memory, the rest spills to disk
+PROGRESS_EVERY     = int(os.environ.get("PROGRESS_EVERY", "50"))    # progress line every N messages per channel
 
 IST     = timezone(timedelta(hours=5, minutes=30))
 now_ist = datetime.now(IST)
@@ -38,13 +194,19 @@ def get_session():
     if t < 15*60+15: return "session_3"
     return "closing"
 
-SESSION    = get_session()
-SESS_LABEL = SESSION_LABELS.get(SESSION, "Update")
-
 # ── LOAD MARKET DATA ──────────────────────────────────────────────────────────
 with open("data.json") as f:
     data = json.load(f)
 
+# The broadcast belongs to the run that produced data.json, not to the clock:
+# a rerun after a session boundary or midnight resumes the same outbox entries.
+SESSION    = data.get("session") or get_session()
+SESS_LABEL = SESSION_LABELS.get(SESSION, "Update")
+try:
+    DATA_DAY = datetime.strptime(data.get("updated_date", ""), "%A, %d %B %Y").strftime("%Y-%m-%d")
+except ValueError:
+    DATA_DAY = now_ist.strftime("%Y-%m-%d")
+
 n         = data.get("nifty", {})
 s         = data.get("sentiment", {})
 g         = data.get("gift", {})
@@ -75,11 +237,57 @@ gap_color    = "#00e676" if "UP" in gift_sig else "#ff1744" if "DOWN" in gift_si
 sent_emoji   = "🟢" if score>55 else "🔴" if score<45 else "🟡"
 
 # ── GOOGLE SHEETS AUTH (service account via JWT) ──────────────────────────────
+def state_cipher():
+    """Fernet keyed from the service-account secret, so only a run that holds
+    it can read sealed state; None without cryptography."""
+    if Fernet is None:
+        return None
+    return Fernet(base64.urlsafe_b64encode(hashlib.sha256(b"nifty-state\0" + SA_JSON.encode()).digest()))
+
+def load_state(path, sealed=False):
+    if sealed and Fernet is None:
+        return {}
+    try:
+        with open(path, "rb") as f:
+            body = f.read()
+        if sealed:
+            body = state_cipher().decrypt(body)
+        return json.loads(body)
+    except (OSError, ValueError, InvalidToken):
+        return {}
+
+def save_state(path, obj, sealed=False):
+    body = json.dumps(obj, indent=1).encode()
+    if sealed:
+        if Fernet is None:
+            return
+        body = state_cipher().encrypt(body)
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(body)
+        os.chmod(path + ".tmp", 0o600)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print("State not written: " + path + " - " + str(e))
+
+sheets_token = {}
+
 def get_sheets_token():
-    """Get OAuth token using service account JSON."""
-    import base64, hashlib, hmac, struct, time as t_
+    """Get OAuth token using service account JSON; reused (sealed in .cache)
+    until a minute before it expires."""
+    if not sheets_token:
+        sheets_token.update(load_state(SHEETS_TOKEN, sealed=True))
+    if sheets_token.get("expires", 0) - 60 > time.time():
+        return sheets_token["token"]
+    sheets_token.update(fetch_sheets_token())
+    save_state(SHEETS_TOKEN, sheets_token, sealed=True)
+    return sheets_token["token"]
 
-    sa = json.loads(SA_JSON)
+def fetch_sheets_token():
+    import hmac, struct, time as t_
+
+    sa     = json.loads(SA_JSON)
     now_ = int(t_.time())
     header  = base64.urlsafe_b64encode(json.dumps({"alg":"RS256","typ":"JWT"}).encode()).rstrip(b"=").decode()
     payload = base64.urlsafe_b64encode(json.dumps({
@@ -117,34 +325,126 @@ def get_sheets_token():
     req = urllib.request.Request("https://oauth2.googleapis.com/token",
                                   data=payload_data, method="POST")
     with urllib.request.urlopen(req, timeout=15) as r:
-        return json.loads(r.read())["access_token"]
+        reply = json.loads(r.read())
+    return {"token": reply["access_token"], "expires": now_ + int(reply.get("expires_in", 3600))}
 
-def get_subscribers():
-    """Read subscriber list from Google Sheet."""
-    print("Reading subscribers from Google Sheet...")
-    token = get_sheets_token()
-    url   = "https://sheets.googleapis.com/v4/spreadsheets/" + SHEET_ID + "/values/A:D"
-    req   = urllib.request.Request(url, headers={"Authorization":"Bearer "+token})
+def sheet_values(token, cells):
+    url = "https://sheets.googleapis.com/v4/spreadsheets/" + SHEET_ID + "/values/" + cells
+    req = urllib.request.Request(url, headers={"Authorization":"Bearer "+token})
     with urllib.request.urlopen(req, timeout=15) as r:
-        result = json.loads(r.read())
+        return json.loads(r.read()).get("values",[])
 
-    rows = result.get("values",[])
-    if len(rows) < 2:
-        print("No subscribers found")
-        return []
+def sheet_blocks(token, start):
+    """Rows from `start` (1-based) on, SHEET_BLOCK rows per request, until a
+    short block marks the end of the sheet."""
+    while True:
+        rows = sheet_values(token, "A" + str(start) + ":D" + str(start+SHEET_BLOCK-1))
+        if rows:
+            yield rows
+        if len(rows) < SHEET_BLOCK:
+            return
+        start += SHEET_BLOCK
+
+def snapshot_rows(meta):
+    """Row count of the last sync, or None when a full read is due."""
+    if Fernet is None or meta.get("sheet") != SHEET_ID or time.time() - meta.get("full", 0) > SHEET_RESYNC_HOURS*3600:
+        return None
+    try:
+        with open(SUBS_SNAPSHOT, "rb") as f:
+            state_cipher().decrypt(f.readline().strip())   # sealed under another key: start over
+            blocks = 1 + sum(1 for _ in f)
+    except (OSError, InvalidToken):
+        return None
+    return meta.get("rows") if blocks == meta.get("blocks") else None
+
+def sheet_rows():
+    """Every sheet row, streamed: the snapshot first, then the rows appended
+    since the last run, fetched block by block.
+
+    The snapshot holds every row seen so far, one sealed block per line, and
+    the meta file its row and block counts, so a normal run starts reading at
+    row count+1. Edits or deletions of existing rows are picked up by the full
+    read every SHEET_RESYNC_HOURS. The counts are only saved once the stream
+    is exhausted; a run cut short leaves a snapshot that no longer matches
+    them, which forces a full read next time. Without cryptography nothing is
+    kept and every run reads the whole sheet.
+    """
+    for stale in ("sheets_token.json", "subscribers.jsonl"):   # plain files from older versions
+        try:
+            os.remove(os.path.join(STATE_DIR, stale))
+        except OSError:
+            pass
+    token  = get_sheets_token()
+    cipher = state_cipher()
+    meta   = load_state(SUBS_META)
+    count  = snapshot_rows(meta)
+    if count is None:
+        meta, count, path, mode = {"sheet": SHEET_ID, "full": time.time(), "blocks": 0}, 0, SUBS_SNAPSHOT + ".tmp", "wb"
+        print("Sheet full sync")
+    else:
+        with open(SUBS_SNAPSHOT, "rb") as f:
+            for line in f:
+                try:
+                    block = json.loads(cipher.decrypt(line.strip()))
+                except (InvalidToken, ValueError):
+                    save_state(SUBS_META, {})   # full read next run
+                    raise RuntimeError("subscriber snapshot unreadable")
+                yield from block
+        path, mode = SUBS_SNAPSHOT, "ab"
+        print("Sheet delta from row " + str(count+1))
+    out = None
+    if cipher:
+        try:
+            os.makedirs(STATE_DIR, exist_ok=True)
+            out = open(path, mode)
+        except OSError as e:
+            print("Subscriber snapshot not written: " + str(e))
+    added = 0
+    try:
+        for block in sheet_blocks(token, count+1):
+            if out:
+                out.write(cipher.encrypt(json.dumps(block).encode()) + b"\n")
+                meta["blocks"] += 1
+            added += len(block)
+            yield from block
+    finally:
+        if out:
+            out.close()
+    print("Sheet rows: " + str(added) + " new, " + str(count+added) + " total")
+    if out:
+        if mode == "wb":
+            os.replace(path, SUBS_SNAPSHOT)
+        meta["rows"] = count + added
+        save_state(SUBS_META, meta)
+
+def get_subscribers():
+    """Yield subscribers from the Google Sheet as rows arrive, skipping invalid
+    and repeated emails. Only an 8-byte hash per address is kept in memory."""
+    print("Reading subscribers from Google Sheet...")
+    seen = set()
+    found, dupes, invalid = 0, 0, 0
 
     # First row is header: Timestamp | Name | Email | Telegram Username
-    subscribers = []
-    for row in rows[1:]:  # skip header
-        if len(row) >= 3:
-            name     = str(row[1]).strip() if len(row)>1 else "Subscriber"
-            email    = str(row[2]).strip() if len(row)>2 else ""
-            telegram = str(row[3]).strip() if len(row)>3 else ""
-            if email and "@" in email:
-                subscribers.append({"name":name,"email":email,"telegram":telegram})
-
-    print("Subscribers found: " + str(len(subscribers)))
-    return subscribers
+    for i, row in enumerate(sheet_rows()):
+        if i == 0 or len(row) < 3:
+            continue
+        name     = str(row[1]).strip()
+        email    = str(row[2]).strip()
+        telegram = str(row[3]).strip() if len(row)>3 else ""
+        if not EMAIL_RE.match(email):
+            invalid += 1
+            continue
+        key = hashlib.blake2b(email.lower().encode(), digest_size=8).digest()
+        if key in seen:
+            dupes += 1
+            continue
+        seen.add(key)
+        found += 1
+        yield {"name":name,"email":email,"telegram":telegram}
+
+    if not found:
+        print("No subscribers found")
+    print("Subscribers found: " + str(found) + " (" + str(dupes) + " duplicate, " + str(invalid) + " invalid skipped)")
 
 # ── EMAIL SENDER ──────────────────────────────────────────────────────────────
 def build_email_html(name):
@@ -247,20 +547,147 @@ def build_email_html(name):
         "</div></div></body></html>"
     )
 
-def send_email_to(name, email):
+class TokenBucket:
+    """Blocking rate limiter: `rate` tokens/sec, at most `burst` saved up."""
+
+    def __init__(self, rate, burst=1):
+        self.rate   = float(rate)
+        self.burst  = float(burst)
+        self.tokens = float(burst)
+        self.stamp  = time.monotonic()
+        self.lock   = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now-self.stamp)*self.rate)
+                self.stamp  = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1-self.tokens)/self.rate
+            time.sleep(wait)
+
+class SmtpPool:
+    """Authenticated SMTP sessions reused across messages.
+
+    Up to `size` connections are opened lazily and handed out one caller at a
+    time; each is retired after `max_per_conn` messages. A send that finds its
+    connection dropped by the server reconnects once and retries.
+    """
+
+    def __init__(self, host, port, use_ssl, user, password, size=1, max_per_conn=90):
+        self.host, self.port, self.use_ssl = host, port, use_ssl
+        self.user, self.password           = user, password
+        self.max_per_conn = max_per_conn
+        self.idle   = []
+        self.slots  = threading.Semaphore(size)
+        self.lock   = threading.Lock()
+        self.opened = 0
+
+    def connect(self):
+        if self.use_ssl:
+            srv = smtplib.SMTP_SSL(self.host, self.port, timeout=30)
+        else:
+            srv = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.password:
+            srv.login(self.user, self.password)
+        with self.lock:
+            self.opened += 1
+        return [srv, 0]
+
+    def discard(self, conn):
+        try:
+            conn[0].quit()
+        except (smtplib.SMTPException, OSError):
+            conn[0].close()
+
+    def send(self, from_addr, to_addr, message):
+        self.slots.acquire()
+        try:
+            with self.lock:
+                conn = self.idle.pop() if self.idle else None
+            for attempt in (0, 1):
+                if conn is None:
+                    conn = self.connect()
+                try:
+                    conn[0].sendmail(from_addr, to_addr, message)
+                    break
+                except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                    dropped = e
+                except smtplib.SMTPResponseException as e:
+                    if e.smtp_code != 421:   # refused message; the session itself is fine
+                        self.release(conn)
+                        raise
+                    dropped = e              # 421: server is closing the session
+                except smtplib.SMTPRecipientsRefused:
+                    self.release(conn)
+                    raise
+                except (smtplib.SMTPException, OSError):
+                    conn[0].close()
+                    raise
+                conn[0].close()              # dropped by the server: reconnect once and retry
+                conn = None
+                if attempt:
+                    raise dropped
+            conn[1] += 1
+            self.release(conn)
+        finally:
+            self.slots.release()
+
+    def release(self, conn):
+        if conn[1] >= self.max_per_conn:
+            self.discard(conn)
+        else:
+            with self.lock:
+                self.idle.append(conn)
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            self.discard(conn)
+
+smtp_pool = SmtpPool(SMTP_HOST, SMTP_PORT, SMTP_SSL, GMAIL_USER,
+                     GMAIL_APP_PASSWORD if SMTP_AUTH else "", SMTP_CONNECTIONS, SMTP_MAX_PER_CONN)
+
+# The body only differs in the greeting, so it is rendered once around a name
+# slot and the whole MIME message is serialised once with @@TO@@ / @@HTML@@
+# markers; each recipient costs two joins and one base64 pass.
+NAME_SLOT = "\x00NAME\x00"
+
+def email_template():
+    """Return (html_head, html_tail, [before_to, before_html, after_html])."""
+    html_head, html_tail = build_email_html(NAME_SLOT).split(NAME_SLOT)
     subject = sent_emoji + " Nifty " + SESS_LABEL + " | " + nifty_p + " (" + nifty_c + ") | " + sent_lbl + " " + str(score) + "/100"
     msg            = MIMEMultipart("alternative")
     msg["Subject"] = subject
     msg["From"]    = "Nifty Live <" + GMAIL_USER + ">"
-    msg["To"]      = email
+    msg["To"]      = "@@TO@@"
     plain = ("Nifty " + SESS_LABEL + " | " + DATE + " " + TIME + "\n\n"
              "Nifty 50: " + nifty_p + " (" + nifty_c + ")\nSentiment: " + sent_lbl + " " + str(score) + "/100\n"
              "Verdict: " + verdict[:200] + "\n\nDashboard: " + DASHBOARD_URL)
     msg.attach(MIMEText(plain, "plain"))
-    msg.attach(MIMEText(build_email_html(name), "html"))
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as srv:
-        srv.login(GMAIL_USER, GMAIL_APP_PASSWORD)
-        srv.sendmail(GMAIL_USER, email, msg.as_string())
+    html = MIMENonMultipart("text", "html", charset="utf-8")
+    html["Content-Transfer-Encoding"] = "base64"
+    html.set_payload("@@HTML@@\n")
+    msg.attach(html)
+    return html_head, html_tail, re.split(r"@@TO@@|@@HTML@@\n", msg.as_string())
+
+EMAIL_HEAD, EMAIL_TAIL, EMAIL_PARTS = email_template()
+
+def send_email_to(name, email):
+    html = base64.encodebytes((EMAIL_HEAD + name + EMAIL_TAIL).encode()).decode()
+    smtp_pool.send(GMAIL_USER, email, EMAIL_PARTS[0] + email + EMAIL_PARTS[1] + html + EMAIL_PARTS[2])
+
+def email_transient(e):
+    """Worth retrying: dropped sessions, network errors and 4xx replies."""
+    if isinstance(e, smtplib.SMTPResponseException):
+        return 400 <= e.smtp_code < 500
+    if isinstance(e, smtplib.SMTPException):
+        return isinstance(e, smtplib.SMTPServerDisconnected)
+    return isinstance(e, OSError)
 
 # ── TELEGRAM SENDER ───────────────────────────────────────────────────────────
 def get_telegram_chat_id(username):
@@ -275,7 +702,7 @@ def get_telegram_chat_id(username):
     except:
         return None
 
-def send_telegram_to(chat_id, name):
+def build_telegram_msg(name):
     imp_e  = {"positive":"🟢","negative":"🔴","neutral":"⚪"}
     news_l = ""
     for item in news:
@@ -305,57 +732,326 @@ def send_telegram_to(chat_id, name):
         "🔗 <a href='" + DASHBOARD_URL + "'>Open Live Dashboard</a>\n"
         "<i>Not financial advice</i>"
     )
+    return msg
 
-    url     = "https://api.telegram.org/bot" + TELEGRAM_BOT_TOKEN + "/sendMessage"
-    payload = urllib.parse.urlencode({
-        "chat_id":    chat_id,
-        "text":       msg,
-        "parse_mode": "HTML",
-    }).encode()
-    req = urllib.request.Request(url, data=payload, method="POST")
-    with urllib.request.urlopen(req, timeout=15) as r:
-        result = json.loads(r.read())
-        if not result.get("ok"):
-            raise Exception(str(result))
+class TelegramLimiter:
+    """Global send budget plus a shared pause set by 429 retry_after replies."""
 
-# ── RUN BROADCAST ─────────────────────────────────────────────────────────────
-try:
-    subscribers = get_subscribers()
-except Exception as e:
-    print("Could not read sheet: " + str(e))
-    subscribers = []
+    def __init__(self, rate):
+        self.interval    = 1.0/rate
+        self.next_slot   = 0.0
+        self.pause_until = 0.0
 
-email_ok, email_fail = 0, 0
-tg_ok, tg_fail       = 0, 0
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now  = loop.time()
+            slot = max(self.next_slot, now, self.pause_until)
+            if slot <= now:
+                self.next_slot = now + self.interval
+                return
+            await asyncio.sleep(slot - now)
 
-for sub in subscribers:
-    name     = sub["name"]
-    email    = sub["email"]
-    telegram = sub.get("telegram","")
+    def pause(self, seconds):
+        loop = asyncio.get_running_loop()
+        self.pause_until = max(self.pause_until, loop.time() + seconds)
 
-    # Email
-    try:
-        send_email_to(name, email)
-        email_ok += 1
-        print("Email sent: " + email)
-    except Exception as e:
-        email_fail += 1
-        print("Email failed: " + email + " - " + str(e)[:60])
-    time.sleep(1.2)  # ~1 email/sec to stay within Gmail limits
-
-    # Telegram
-    chat_id = get_telegram_chat_id(telegram)
-    if chat_id:
+def tg_connection():
+    u   = urllib.parse.urlparse(TELEGRAM_API_URL)
+    cls = http.client.HTTPSConnection if u.scheme == "https" else http.client.HTTPConnection
+    return cls(u.netloc, timeout=15)
+
+def tg_send(conn, chat_id, text):
+    """POST sendMessage on a keep-alive connection; returns the decoded reply.
+    A connection the server has closed is reopened once."""
+    body = urllib.parse.urlencode({"chat_id": chat_id, "text": text, "parse_mode": "HTML"})
+    path = urllib.parse.urlparse(TELEGRAM_API_URL).path + "/bot" + TELEGRAM_BOT_TOKEN + "/sendMessage"
+    for attempt in (0, 1):
+        try:
+            conn.request("POST", path, body, {"Content-Type": "application/x-www-form-urlencoded"})
+            return json.loads(conn.getresponse().read())
+        except (http.client.HTTPException, ConnectionError):
+            conn.close()
+            if attempt:
+                raise
+
+# ── CHANNELS ──────────────────────────────────────────────────────────────────
+class Channel:
+    """One delivery channel fed from the shared subscriber stream.
+
+    `target(sub)` picks the address to send to (falsy skips the subscriber)
+    and `deliver(sub, address)` sends one message. Every channel has its own
+    bounded queue, worker threads, rate limiter, retry policy, daily limit and
+    counters. offer() never blocks: what the full queue cannot take goes to
+    the channel's spill file and a pump thread feeds it back in order, so a
+    slow or failing channel never holds up the reader or the other channels.
+    """
+
+    def __init__(self, name, target, deliver, concurrency=1, bucket=None,
+                 retries=0, transient=None, limit=None):
+        self.name, self.target, self.deliver = name, target, deliver
+        self.concurrency = max(1, concurrency)
+        self.bucket      = bucket
+        self.retries     = retries
+        self.transient   = transient or (lambda e: False)
+        self.limit       = limit
+        self.queue       = queue.Queue(CHANNEL_QUEUE)
+        self.counts      = {"sent": 0, "failed": 0, "skipped": 0, "retried": 0, "already sent": 0}
+        self.taken       = 0
+        self.lock        = threading.Lock()
+        self.threads     = []
+        self.more        = threading.Condition()   # guards the spill and the end of input
+        self.spill       = None                    # anonymous temp file, one JSON job per line
+        self.spilled     = 0
+        self.read_at     = 0
+        self.ended       = False
+        self.error       = None
+
+    def start(self):
+        if self.limit is not None:   # the daily limit also covers earlier runs
+            self.taken = outbox.sent_since(self.name, 24*3600)
+        for _ in range(self.concurrency):
+            t = threading.Thread(target=self.work, name=self.name)
+            t.start()
+            self.threads.append(t)
+        self.start_pump()
+
+    def start_pump(self):
+        t = threading.Thread(target=self.pump, name=self.name + " pump")
+        t.start()
+        self.threads.append(t)
+
+    def admit(self, address):
+        """True when `address` still needs this session's message."""
+        if not address:
+            return False
+        if outbox.claim(self.name, address):
+            return True
+        self.count("already sent")
+        return False
+
+    def offer(self, sub):
+        address = self.target(sub)
+        if not self.admit(address):
+            return
+        with self.more:
+            if not self.spilled and self.put_nowait((sub, address)):
+                return
+            if self.spill is None:
+                self.spill = tempfile.TemporaryFile()
+            self.spill.seek(0, 2)
+            self.spill.write((json.dumps([sub, address]) + "\n").encode())
+            self.spilled += 1
+            self.more.notify()
+
+    def pump(self):
+        """Move spilled jobs into the queue as it drains, then stop the workers
+        once the input has ended."""
+        while True:
+            with self.more:
+                while not self.spilled and not self.ended:
+                    self.more.wait()
+                if not self.spilled:
+                    break
+                self.spill.seek(self.read_at)
+                line = self.spill.readline()
+                self.read_at  = self.spill.tell()
+                self.spilled -= 1
+            self.put(tuple(json.loads(line)))   # blocks while this channel is CHANNEL_QUEUE behind
+        if self.spill:
+            self.spill.close()
+        for _ in range(self.concurrency):
+            self.put(None)
+
+    def put(self, job):
+        self.queue.put(job)
+
+    def put_nowait(self, job):
         try:
-            send_telegram_to(chat_id, name)
-            tg_ok += 1
-            print("Telegram sent: " + name)
-        except Exception as e:
-            tg_fail += 1
-            print("Telegram failed: " + name + " - " + str(e)[:60])
-        time.sleep(0.05)  # 20/sec max
+            self.queue.put_nowait(job)
+            return True
+        except queue.Full:
+            return False
+
+    def finish(self, error=None):
+        """No more subscribers: workers exit once queue and spill drain. With
+        an error the input was cut short and the channel reports failure."""
+        with self.more:
+            self.ended, self.error = True, error
+            self.more.notify()
+
+    def join(self):
+        for t in self.threads:
+            t.join()
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+            done = self.counts["sent"] + self.counts["failed"]
+        if key in ("sent", "failed") and done % PROGRESS_EVERY == 0:
+            print(self.name + " progress: " + self.summary())
+
+    def take(self):
+        """Reserve one message against the daily limit."""
+        with self.lock:
+            if self.limit is not None and self.taken >= self.limit:
+                return False
+            self.taken += 1
+            return True
+
+    def work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            sub, address = job
+            if not self.take():
+                self.count("skipped")
+                outbox.mark(self.name, address, "skipped", "daily limit")
+                print(self.name + " skipped (daily limit " + str(self.limit) + "): " + str(address))
+                continue
+            for attempt in range(self.retries+1):
+                if self.bucket:
+                    self.bucket.acquire()
+                try:
+                    self.deliver(sub, address)
+                except Exception as e:
+                    if attempt < self.retries and self.transient(e):
+                        self.count("retried")
+                        time.sleep(2**attempt)
+                        continue
+                    self.count("failed")
+                    outbox.mark(self.name, address, "failed", error_code(e))
+                    print(self.name + " failed: " + str(address) + " - " + str(e)[:60])
+                    break
+                self.count("sent")
+                outbox.mark(self.name, address, "sent")
+                print(self.name + " sent: " + str(address))
+                break
+
+    def summary(self):
+        c = self.counts
+        return (str(c["sent"]) + " sent, " + str(c["failed"]) + " failed, "
+                + str(c["skipped"]) + " skipped, " + str(c["retried"]) + " retried, "
+                + str(c["already sent"]) + " already sent"
+                + (" - INCOMPLETE, " + self.error if self.error else ""))
+
+class TelegramChannel(Channel):
+    """Telegram on its own event loop: TG_CONCURRENCY workers, each holding a
+    keep-alive connection, share one TelegramLimiter and per-chat pacing."""
+
+    def __init__(self):
+        Channel.__init__(self, "Telegram", lambda sub: get_telegram_chat_id(sub.get("telegram", "")),
+                         None, TG_CONCURRENCY, retries=TG_RETRIES)
+        self.ready = threading.Event()
+
+    def start(self):
+        t = threading.Thread(target=asyncio.run, args=(self.run(),), name=self.name)
+        t.start()
+        self.threads.append(t)
+        self.ready.wait()
+        self.start_pump()
+
+    def put(self, job):
+        asyncio.run_coroutine_threadsafe(self.aqueue.put(job), self.loop).result()
+
+    def put_nowait(self, job):
+        async def put():
+            if self.aqueue.full():
+                return False
+            self.aqueue.put_nowait(job)
+            return True
+        return asyncio.run_coroutine_threadsafe(put(), self.loop).result()
+
+    async def run(self):
+        self.loop   = asyncio.get_running_loop()
+        self.aqueue = asyncio.Queue(CHANNEL_QUEUE)
+        self.ready.set()
+        limiter   = TelegramLimiter(TG_RATE)
+        last_sent = {}   # chat_id -> loop time of the last message to it
+        await asyncio.gather(*(self.worker(limiter, last_sent) for _ in range(self.concurrency)))
+
+    async def send(self, conn, chat_id, name, limiter, last_sent):
+        """One sendMessage within the bot-wide and per-chat limits. A 429 pauses
+        every worker for retry_after and the message is retried up to TG_RETRIES
+        times. Returns the final reply."""
+        loop = asyncio.get_running_loop()
+        for tries in range(self.retries+1):
+            gap = last_sent.get(chat_id, -1e9) + TG_CHAT_INTERVAL - loop.time()
+            if gap > 0:
+                await asyncio.sleep(gap)
+            await limiter.wait()
+            last_sent[chat_id] = loop.time()
+            try:
+                result = await asyncio.to_thread(tg_send, conn, chat_id, build_telegram_msg(name))
+            except Exception as e:
+                result = {"ok": False, "description": str(e), "exception": error_code(e)}
+            retry_after = (result.get("parameters") or {}).get("retry_after")
+            if result.get("ok") or result.get("error_code") != 429 or not retry_after or tries == self.retries:
+                return result
+            self.count("retried")
+            print("Telegram 429: pausing " + str(retry_after) + "s")
+            limiter.pause(retry_after)
+        return result
+
+    async def worker(self, limiter, last_sent):
+        conn = tg_connection()
+        try:
+            while True:
+                job = await self.aqueue.get()
+                if job is None:
+                    return
+                sub, chat_id = job
+                result = await self.send(conn, chat_id, sub["name"], limiter, last_sent)
+                if result.get("ok"):
+                    self.count("sent")
+                    outbox.mark(self.name, chat_id, "sent")
+                    print("Telegram sent: " + sub["name"])
+                else:
+                    self.count("failed")
+                    outbox.mark(self.name, chat_id, "failed", result.get("exception") or "HTTP " + str(result.get("error_code")))
+                    print("Telegram failed: " + sub["name"] + " - " + str(result.get("description", result))[:60])
+        finally:
+            conn.close()
+
+# ── RUN BROADCAST ─────────────────────────────────────────────────────────────
+outbox   = Outbox(OUTBOX, DATA_DAY, SESSION, OUTBOX_KEY)
+channels = [
+    Channel("Email", lambda sub: sub.get("email"), lambda sub, email: send_email_to(sub["name"], email),
+            EMAIL_CONCURRENCY, TokenBucket(EMAIL_RATE, EMAIL_BURST), EMAIL_RETRIES, email_transient,
+            EMAIL_DAILY_LIMIT),
+    TelegramChannel(),
+]
+
+# The sheet is read once and every subscriber is offered to each channel as
+# it streams in. Each channel works through its own queue in parallel; a
+# channel that falls behind spills to its own temp file instead of holding up
+# the reader, so memory stays flat and the other channels keep their pace.
+# A sheet error ends every channel as incomplete and the run exits non-zero.
+read_error = None
+for ch in channels:
+    ch.start()
+try:
+    for sub in get_subscribers():
+        for ch in channels:
+            ch.offer(sub)
+except Exception as e:
+    read_error = "could not read sheet: " + str(e)[:100]
+    print(read_error)
+finally:
+    for ch in channels:
+        ch.finish(read_error)
+    for ch in channels:
+        ch.join()
+    outbox.close()
+smtp_pool.close()
 
 print("")
 print("Broadcast complete!")
-print("Emails: " + str(email_ok) + " sent, " + str(email_fail) + " failed")
-print("Telegram: " + str(tg_ok) + " sent, " + str(tg_fail) + " failed")
+for ch in channels:
+    line = ch.name + ": " + ch.summary()
+    if ch.name == "Email":
+        line += " (" + str(smtp_pool.opened) + " SMTP connection(s))"
+    print(line)
+if read_error:
+    sys.exit(1)
@@ -3,26 +3,60 @@ Nifty Morning Brief — Instagram Card Generator v2
 1080x1080px · Poppins font · High readability design
 """
 
+import PIL
 from PIL import Image, ImageDraw, ImageFont
-import re, os
+import re, os, io, json, time, hashlib, multiprocessing
 from datetime import datetime, timezone, timedelta
 
+try:
+    import numpy as np
+except ImportError:
+    np = None   # make_bg falls back to drawing the glow rings with ImageDraw
+
 PF = "/usr/share/fonts/truetype/google-fonts/"
 LF = "/usr/share/fonts/truetype/liberation/"
 
+FONT_FILES = {
+    "black":   PF + "Poppins-Bold.ttf",
+    "bold":    PF + "Poppins-Bold.ttf",
+    "medium":  PF + "Poppins-Medium.ttf",
+    "regular": PF + "Poppins-Regular.ttf",
+    "light":   PF + "Poppins-Light.ttf",
+    "mono":    LF + "LiberationMono-Bold.ttf",
+}
+
+# Every (face, size) the two cards draw with, incl. the 14-24 auto-fit range
+PRELOAD_FONTS = (
+    [("black", s) for s in list(range(14, 25)) + [30, 40, 42, 60, 88]]
+    + [("bold", s) for s in (14, 15, 16, 17, 18, 20, 28)]
+    + [("medium", s) for s in (14, 17, 18)]
+    + [("regular", s) for s in (16, 17, 18, 20, 24, 26)]   # 24/26: story verdict and views
+    + [("light", 16)]
+)
+
+_fonts          = {}      # (file, size) -> font, shared by faces that map to the same file
+_font_fallbacks = set()   # files already reported as missing
+
 def fnt(name, size):
-    paths = {
-        "black":   PF + "Poppins-Bold.ttf",
-        "bold":    PF + "Poppins-Bold.ttf",
-        "medium":  PF + "Poppins-Medium.ttf",
-        "regular": PF + "Poppins-Regular.ttf",
-        "light":   PF + "Poppins-Light.ttf",
-        "mono":    LF + "LiberationMono-Bold.ttf",
-    }
-    try:
-        return ImageFont.truetype(paths.get(name, paths["regular"]), size)
-    except:
-        return ImageFont.load_default()
+    """Font for (face, size); each file/size pair is parsed once per process."""
+    path = FONT_FILES.get(name, FONT_FILES["regular"])
+    f    = _fonts.get((path, size))
+    if f is None:
+        try:
+            f = ImageFont.truetype(path, size)
+        except OSError:
+            if path not in _font_fallbacks:
+                _font_fallbacks.add(path)
+                print("Font warning: cannot load " + path + ", using PIL default font")
+            f = ImageFont.load_default()
+        _fonts[(path, size)] = f
+    return f
+
+def warm_fonts(pairs=PRELOAD_FONTS):
+    for name, size in pairs:
+        fnt(name, size)
+
+warm_fonts()
 
 BG     = (8,  12,  22)
 CARD   = (14, 22,  40)
@@ -40,6 +74,26 @@ MUTED  = (70, 95,  130)
 
 W, H = 1080, 1080
 
+CACHE_DIR = os.environ.get("CARD_CACHE_DIR", ".cache/cards")
+# Part of every on-disk cache key: bump CACHE_VERSION whenever make_bg, the glow
+# layers, rr() or draw_ops() draw differently, so carried-forward caches are not
+# reused. The Pillow version and the glow code path are keyed as well.
+CACHE_VERSION = 1
+CACHE_SALT    = (CACHE_VERSION, PIL.__version__, np is not None)
+
+# Set to a dict to collect seconds per phase ("bg", "panels", "encode"); used by
+# bench/bench_cards.py. Text drawing is whatever remains of the render time.
+PHASE_TIMES = None
+
+def add_phase(name, t0):
+    if PHASE_TIMES is not None:
+        PHASE_TIMES[name] = PHASE_TIMES.get(name, 0.0) + time.perf_counter() - t0
+
+# Background glows: (centre x, centre y, radius, peak alpha, colour); centres
+# are relative to the card's top-left / bottom-right corner as in the design.
+GLOW_BLUE  = (200, 0, 700, 18, (0,130,255))
+GLOW_GREEN = (100, 0, 500, 12, (0,180,80))
+
 def cc(v):
     return GREEN if str(v).startswith("+") else RED
 
@@ -52,15 +106,26 @@ def sc(v):
     return YELLOW
 
 def rr(img, x1, y1, x2, y2, r=14, fill=None, outline=None, ow=1):
-    ov = Image.new("RGBA", img.size, (0,0,0,0))
-    d  = ImageDraw.Draw(ov)
+    # Draw into a buffer the size of the shape's bbox (clipped to the image) and
+    # composite only that region instead of a full-frame overlay per shape.
+    t0 = time.perf_counter()
+    bx1, by1 = max(int(x1), 0), max(int(y1), 0)
+    bx2, by2 = min(int(x2)+1, img.width), min(int(y2)+1, img.height)
+    if bx2 <= bx1 or by2 <= by1:
+        return
+    ov  = Image.new("RGBA", (bx2-bx1, by2-by1), (0,0,0,0))
+    d   = ImageDraw.Draw(ov)
+    box = [x1-bx1, y1-by1, x2-bx1, y2-by1]
     if fill:
         fc = fill if len(fill)==4 else fill+(255,)
-        d.rounded_rectangle([x1,y1,x2,y2], radius=r, fill=fc)
+        d.rounded_rectangle(box, radius=r, fill=fc)
     if outline:
         oc = outline if len(outline)==4 else outline+(255,)
-        d.rounded_rectangle([x1,y1,x2,y2], radius=r, outline=oc, width=ow)
-    img.alpha_composite(ov)
+        d.rounded_rectangle(box, radius=r, outline=oc, width=ow)
+    img.alpha_composite(ov, dest=(bx1, by1))
+    add_phase("panels", t0)
+
+_measure = ImageDraw.Draw(Image.new("RGBA", (1,1)))   # for sizing text outside a card
 
 def tw(draw, text, f):
     bb = draw.textbbox((0,0), str(text), font=f)
@@ -73,33 +138,294 @@ def pill(img, draw, x, y, text, color):
     draw.text((x+11, y+6), text, font=f, fill=color)
     return w_
 
-def wrap(draw, text, f, max_w):
-    words, lines, cur = text.split(), [], ""
-    for w_ in words:
-        test = (cur+" "+w_).strip()
-        if tw(draw, test, f) <= max_w:
-            cur = test
+# ── TEXT LAYOUT ───────────────────────────────────────────────────────────────
+_advances = {}   # font -> {word: advance width}; fonts are shared via fnt()'s cache
+
+def advance(f, text):
+    """Advance width of text in font f, measured once per (font, text)."""
+    cache = _advances.get(f)
+    if cache is None:
+        cache = _advances[f] = {}
+    w_ = cache.get(text)
+    if w_ is None:
+        w_ = cache[text] = f.getlength(text)
+    return w_
+
+def clip_to(text, f, max_w, ellipsis="…"):
+    """Longest prefix of text that fits max_w with the ellipsis appended."""
+    lo, hi = 0, len(text)
+    while lo < hi:   # binary search on the prefix length: O(log n) measurements
+        mid = (lo+hi+1)//2
+        if f.getlength(text[:mid].rstrip() + ellipsis) <= max_w:
+            lo = mid
         else:
-            if cur: lines.append(cur)
-            cur = w_
-    if cur: lines.append(cur)
-    return lines
-
-def make_bg():
-    img = Image.new("RGBA", (W,H), BG)
-    ov  = Image.new("RGBA", (W,H), (0,0,0,0))
-    d   = ImageDraw.Draw(ov)
-    for r in range(700,0,-20):
-        a = int(18*(1-r/700))
-        d.ellipse([-r+200,-r,r+200,r], fill=(0,130,255,a))
-    for r in range(500,0,-20):
-        a = int(12*(1-r/500))
-        d.ellipse([W-r+100,H-r,W+r+100,H+r], fill=(0,180,80,a))
-    img.alpha_composite(ov)
+            hi = mid-1
+    return text[:lo].rstrip() + ellipsis
+
+def layout(text, f, max_w, max_lines=None, line_h=None, ellipsis="…"):
+    """Greedy word wrap from summed, cached word advances.
 
+    Returns (line boxes, truncated): boxes are (text, dy, width) with
+    dy = line index * line_h. When the text needs more than max_lines the last
+    line is cut with an ellipsis and truncated is True. A single word wider
+    than max_w gets a line of its own, as before.
+    """
+    words = str(text).split()
+    sp    = advance(f, " ")
+    lines, cur, cur_w = [], [], 0
+    truncated = False
+    for i, w_ in enumerate(words):
+        ww = advance(f, w_)
+        if cur and cur_w + sp + ww > max_w:
+            lines.append((" ".join(cur), cur_w))
+            cur, cur_w = [], 0
+            if max_lines and len(lines) == max_lines:
+                last, _ = lines[-1]
+                tail    = clip_to(last + " " + " ".join(words[i:]), f, max_w, ellipsis)
+                lines[-1] = (tail, f.getlength(tail))
+                truncated = True
+                break
+        cur_w = cur_w + sp + ww if cur else ww
+        cur.append(w_)
+    else:
+        if cur:
+            lines.append((" ".join(cur), cur_w))
+    if max_lines == 1 and lines and lines[0][1] > max_w:
+        tail      = clip_to(lines[0][0], f, max_w, ellipsis)
+        lines[0]  = (tail, f.getlength(tail))
+        truncated = True
+    if line_h is None:
+        line_h = int(getattr(f, "size", 10) * 1.3)
+    return [(t, i*line_h, lw) for i, (t, lw) in enumerate(lines)], truncated
+
+def fit(text, face, max_w, max_lines=1, size=24, min_size=14, line_h=None):
+    """Largest font size in [min_size, size] that lays text out without cutting it.
+
+    Returns (font, line boxes); at min_size the text is laid out (and cut) as is.
+    """
+    for sz in range(size, min_size-1, -1):
+        f = fnt(face, sz)
+        boxes, truncated = layout(text, f, max_w, max_lines, line_h)
+        if not truncated and all(lw <= max_w for _, _, lw in boxes):
+            return f, boxes
+    return f, boxes
+
+def wrap(draw, text, f, max_w):
+    return [t for t, _, _ in layout(text, f, max_w)[0]]
+
+_bg_cache = {}   # (w, h, palette) -> finished RGBA background
+
+def glow_layer(w, h):
+    """Both radial glows in one NumPy pass.
+
+    Matches the stacked 20px rings the ImageDraw path draws: every pixel takes
+    the alpha of the smallest ring that contains it, and the green glow is
+    painted last so it replaces the blue one wherever the two overlap.
+    """
+    ys  = np.arange(h, dtype=np.float32)[:, None]
+    xs  = np.arange(w, dtype=np.float32)[None, :]
+    out = np.zeros((h, w, 4), dtype=np.uint8)
+    for (ox, oy, R, a_max, col), (cx, cy) in (
+            (GLOW_BLUE,  (GLOW_BLUE[0], GLOW_BLUE[1])),
+            (GLOW_GREEN, (w+GLOW_GREEN[0], h+GLOW_GREEN[1]))):
+        ring = np.maximum(np.ceil(np.sqrt((xs-cx)**2 + (ys-cy)**2)/20), 1)*20
+        mask = ring <= R
+        out[mask, :3] = col
+        out[mask, 3]  = (a_max*(1-ring[mask]/R)).astype(np.uint8)
+    return Image.fromarray(out, "RGBA")
+
+def glow_layer_slow(w, h):
+    ov = Image.new("RGBA", (w,h), (0,0,0,0))
+    d  = ImageDraw.Draw(ov)
+    for (ox, oy, R, a_max, col), (cx, cy) in (
+            (GLOW_BLUE,  (GLOW_BLUE[0], GLOW_BLUE[1])),
+            (GLOW_GREEN, (w+GLOW_GREEN[0], h+GLOW_GREEN[1]))):
+        for r in range(R,0,-20):
+            a = int(a_max*(1-r/R))
+            d.ellipse([cx-r,cy-r,cx+r,cy+r], fill=col+(a,))
+    return ov
+
+def make_bg(w=W, h=H):
+    """Card background, built once per (size, palette) and reused via copy().
+
+    The finished layer is also kept as a PNG under CACHE_DIR so later runs
+    (and the render worker processes) skip building it altogether.
+    """
+    t0  = time.perf_counter()
+    key = (w, h, BG, GLOW_BLUE, GLOW_GREEN)
+    bg  = _bg_cache.get(key)
+    if bg is None:
+        tag  = hashlib.sha1(repr((CACHE_SALT, key)).encode()).hexdigest()[:12]
+        path = os.path.join(CACHE_DIR, "bg_" + str(w) + "x" + str(h) + "_" + tag + ".png")
+        try:
+            bg = Image.open(path).convert("RGBA")
+        except (OSError, ValueError):
+            bg = Image.new("RGBA", (w,h), BG)
+            bg.alpha_composite(glow_layer(w, h) if np is not None else glow_layer_slow(w, h))
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                tmp = path + "." + str(os.getpid()) + ".tmp"
+                bg.save(tmp, "PNG")
+                os.replace(tmp, path)
+            except OSError as e:
+                print("Background cache not written: " + str(e))
+        _bg_cache[key] = bg
+    bg = bg.copy()
+    add_phase("bg", t0)
+    return bg
+
+# ── STATIC CHROME ─────────────────────────────────────────────────────────────
+# Everything on a card that does not depend on the data (bars, panel frames,
+# section titles, fixed labels) is described as a list of ops:
+#   ("rr",   (x1, y1, x2, y2), {rr keyword args})
+#   ("text", (x1, x2, y), text, face, size, fill, align)   align: "l" | "c" | "r"
+# For "text", "l" draws at x1, "c" centres between x1 and x2, "r" ends at x2.
+# The rendered chrome is cached by a hash of the ops, so a layout change is a
+# new key, and each card draws only its data-bound parts on a copy.
+_chrome_cache = {}
+
+def draw_ops(img, ops):
+    draw = ImageDraw.Draw(img)
+    for op in ops:
+        if op[0] == "rr":
+            rr(img, *op[1], **op[2])
+        elif op[0] == "text":
+            (x1, x2, y), text, face, size, fill, align = op[1:]
+            f  = fnt(face, size)
+            x  = x1
+            if align != "l":
+                w_ = tw(draw, text, f)
+                x  = x1+((x2-x1)-w_)//2 if align == "c" else x2-w_
+            draw.text((x, y), text, font=f, fill=fill)
     return img
 
-def generate_card(data: dict, session: str, output_path: str = "nifty_card.png"):
+def chrome(ops, size=(W, H)):
+    """Background plus static ops, rendered once per layout and reused via copy()."""
+    key = (CACHE_SALT, size, BG, GLOW_BLUE, GLOW_GREEN, FONT_FILES, tuple(sorted(_font_fallbacks)), tuple(ops))
+    tag = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+    img = _chrome_cache.get(tag)
+    if img is None:
+        path = os.path.join(CACHE_DIR, "chrome_" + tag + ".png")
+        try:
+            t0  = time.perf_counter()
+            img = Image.open(path).convert("RGBA")
+            add_phase("bg", t0)
+        except (OSError, ValueError):
+            img = draw_ops(make_bg(*size), ops)
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                tmp = path + "." + str(os.getpid()) + ".tmp"
+                img.save(tmp, "PNG")
+                os.replace(tmp, path)
+            except OSError as e:
+                print("Chrome cache not written: " + str(e))
+        _chrome_cache[tag] = img
+    t0  = time.perf_counter()
+    img = img.copy()
+    add_phase("bg", t0)
+    return img
+
+def header_ops(bar_h, bar_a, top, subtitle, w=W):
+    return [
+        ("rr",   (0, 0, w, bar_h), {"r": 0, "fill": CARD+(bar_a,)}),
+        ("rr",   (0, 0, w, 4),     {"r": 0, "fill": ACCENT+(230,)}),   # top accent stripe
+        ("rr",   (24, top, 72, 72), {"r": 10, "fill": (0,50,110,255), "outline": ACCENT+(130,), "ow": 1}),
+        ("text", (28, None, top+2),  "NB",         "black",   30, WHITE, "l"),
+        ("text", (82, None, top),    "NIFTY LIVE", "black",   30, TEXT,  "l"),
+        ("text", (82, None, top+36), subtitle,     "regular", 17, TEXT2, "l"),
+    ]
+
+def footer_ops(footer_h=54, size=(W, H)):
+    w, h = size
+    fy   = h - footer_h
+    return [
+        ("rr",   (0, fy, w, h),  {"r": 0, "fill": CARD+(230,)}),
+        ("rr",   (0, fy, w, fy), {"r": 0, "fill": BORDER+(200,)}),
+        ("text", (40, None, fy+14), "sameerxceed.github.io/nifty-dashboard", "regular", 16, MUTED, "l"),
+        ("text", (None, w-40, fy+14), "Not financial advice",               "regular", 16, MUTED, "r"),
+    ]
+
+PIVOT_COLS = [("R2",RED),("R1",RED),("PP",ACCENT),("S1",GREEN),("S2",GREEN)]
+
+def news_rows(size):
+    """News rows the main card has room for: 3 on the square, 6 on a tall
+    (story) canvas, none on a short (Open Graph) one."""
+    w, h = size
+    return 0 if h < 900 else 6 if h > w else 3
+
+def main_geometry(n_news, size=(W, H)):
+    """Top y of each main-card section, plus the verdict box as (y, height).
+
+    The square keeps the original design. A tall canvas caps the verdict at
+    10 lines and spreads the spare height evenly between the sections; a short
+    one leaves out GIFT/VIX and the news (see news_rows).
+    """
+    w, h    = size
+    tall    = h > w
+    heights = [("hero", 162)]
+    if h >= 900:
+        heights.append(("gift", 118))
+    heights.append(("pivots", 124))
+    if news_rows(size):
+        heights.append(("news", 28 + 58*n_news + 8))
+    bottom = h - 54 - 14
+    used   = 118 + sum(hh for _, hh in heights) + (60 + 10*34 if tall else 0)
+    gap    = max(bottom - used, 0) // (len(heights)+1) if tall else 0
+    geo, y = {}, 118
+    for name, hh in heights:
+        y += gap
+        geo[name] = y
+        y += hh
+    y += gap
+    geo["verdict"] = (y, bottom - y)
+    return geo
+
+def main_layout(n_news, size=(W, H)):
+    """Static ops of the main card; the canvas size and the number of news rows move things."""
+    W, H = size
+    geo  = main_geometry(n_news, size)
+    ops  = header_ops(88, 245, 16, "AI Market Intelligence  ·  NSE India", W)
+    y    = geo["hero"]
+    ops += [("rr", (24, y, W-24, y+150), {"r": 18, "fill": CARD+(240,), "outline": BORDER+(180,), "ow": 1})]
+    if "gift" in geo:
+        y    = geo["gift"]
+        half = (W-78)//2
+        vx   = 24+half+28
+        ops += [
+            ("rr",   (24, y, 24+half, y+106), {"r": 14, "fill": CARD+(220,), "outline": BORDER+(150,), "ow": 1}),
+            ("text", (44, None, y+10), "GIFT NIFTY", "bold", 18, ACCENT, "l"),
+            ("rr",   (vx, y, W-24, y+106),   {"r": 14, "fill": CARD+(220,), "outline": BORDER+(150,), "ow": 1}),
+            ("text", (vx+20, None, y+10), "INDIA VIX", "bold", 18, PURPLE, "l"),
+        ]
+    y    = geo["pivots"]
+    ops += [("text", (24, None, y+4), "KEY LEVELS", "bold", 18, MUTED, "l")]
+    y   += 30
+    cw_piv = (W-52-32)//5
+    for i, (lbl_, col) in enumerate(PIVOT_COLS):
+        cx    = 24+i*(cw_piv+8)
+        is_pp = lbl_=="PP"
+        ops  += [
+            ("rr",   (cx, y, cx+cw_piv, y+82), {"r": 12, "fill": col+(35 if is_pp else 18,),
+                                                "outline": col+(90 if is_pp else 55,), "ow": 2 if is_pp else 1}),
+            ("text", (cx, cx+cw_piv, y+8), lbl_, "bold", 17, col, "c"),
+        ]
+    if "news" in geo:
+        y    = geo["news"]
+        ops += [("text", (24, None, y+2), "MARKET NEWS", "bold", 18, MUTED, "l")]
+        y   += 28
+        for idx in range(n_news):
+            ops += [("rr", (24, y, W-24, y+54), {"r": 10, "fill": (CARD2 if idx%2==0 else CARD)+(210,)})]
+            y   += 58
+    y, avail = geo["verdict"]
+    ops += [
+        ("rr",   (24, y, W-24, y+avail), {"r": 16, "fill": (8,28,14,235), "outline": GREEN+(95,), "ow": 2}),
+        ("text", (46, None, y+12), ">> TRADING VERDICT", "bold", 20, GREEN, "l"),
+    ]
+    return ops + footer_ops(size=size)
+
+def render_card(data: dict, session: str, size=(W, H)):
+    """Main brief card as an RGBA image, 1080x1080 unless another size is given."""
+    W, H    = size
     IST     = timezone(timedelta(hours=5, minutes=30))
     now_ist = datetime.now(IST)
     TIME    = now_ist.strftime("%I:%M %p")
@@ -130,32 +456,17 @@ def generate_card(data: dict, session: str, output_path: str = "nifty_card.png")
     vix_v     = str(vix_d.get("value","—"))
     vix_lev   = str(vix_d.get("level","moderate"))
     p         = data.get("pivot",{})
-    r1        = str(p.get("r1","—"))
-    pp_       = str(p.get("pp","—"))
-    s1_       = str(p.get("s1","—"))
-    r2        = str(p.get("r2","—"))
-    s2_       = str(p.get("s2","—"))
-    news_list = data.get("news",[])[:3]
+    pivot_v   = {k: str(p.get(k.lower(),"—")) for k,_ in PIVOT_COLS}
+    news_list = data.get("news",[])[:news_rows(size)]
     brief     = data.get("brief","")
     m         = re.search(r"TRADING VERDICT:?(.*?)(?:\n\n|\Z)", brief, re.IGNORECASE|re.DOTALL)
     verdict   = m.group(1).strip().replace("\n"," ") if m else "Analysis pending for this session."
 
-    img  = make_bg()
+    geo  = main_geometry(len(news_list), size)
+    img  = chrome(main_layout(len(news_list), size), size)
     draw = ImageDraw.Draw(img)
 
     # ── HEADER ────────────────────────────────────────────────────────────────
-    rr(img, 0, 0, W, 88, r=0, fill=CARD+(245,))
-    # top accent stripe
-    ov2 = Image.new("RGBA",(W,H),(0,0,0,0))
-    ds  = ImageDraw.Draw(ov2)
-    ds.rectangle([0,0,W,4], fill=ACCENT+(230,))
-    img.alpha_composite(ov2)
-
-    rr(img, 24,16,72,72, r=10, fill=(0,50,110,255), outline=ACCENT+(130,), ow=1)
-    draw.text((28,18), "NB", font=fnt("black",30), fill=WHITE)
-    draw.text((82,16), "NIFTY LIVE", font=fnt("black",30), fill=TEXT)
-    draw.text((82,52), "AI Market Intelligence  ·  NSE India", font=fnt("regular",17), fill=TEXT2)
-
     # session badge
     sf  = fnt("bold",17)
     sw_ = tw(draw, sess_lbl, sf)
@@ -168,10 +479,9 @@ def generate_card(data: dict, session: str, output_path: str = "nifty_card.png")
     dtw_   = tw(draw, dt_txt, fnt("light",16))
     draw.text(((W-dtw_)//2, 94), dt_txt, font=fnt("light",16), fill=MUTED)
 
-    y = 118
+    y = geo["hero"]
 
     # ── NIFTY PRICE HERO ──────────────────────────────────────────────────────
-    rr(img, 24, y, W-24, y+150, r=18, fill=CARD+(240,), outline=BORDER+(180,), ow=1)
     pcol = cc(nifty_c)
     pf   = fnt("black", 88)
     pw_  = tw(draw, nifty_p, pf)
@@ -198,52 +508,32 @@ def generate_card(data: dict, session: str, output_path: str = "nifty_card.png")
         g_ = int(255*min(t*2,1))
         draw.rectangle([bx+i,by,bx+i+1,by+8], fill=(r_,g_,0,200))
 
-    y += 162
-
     # ── GIFT NIFTY | VIX ──────────────────────────────────────────────────────
-    half = (W-78)//2
-    rr(img, 24, y, 24+half, y+106, r=14, fill=CARD+(220,), outline=BORDER+(150,), ow=1)
-    draw.text((44, y+10), "GIFT NIFTY", font=fnt("bold",18), fill=ACCENT)
-    draw.text((44, y+34), gift_v, font=fnt("black",42), fill=TEXT)
-    draw.text((44, y+80), "Gap:  " + gift_gap + " pts", font=fnt("medium",18), fill=cc(gift_gap))
-    pill(img, draw, 24+half-180, y+10, gift_sig.replace("_"," ").upper(), sc(gift_sig))
-
-    vx = 24+half+28
-    rr(img, vx, y, W-24, y+106, r=14, fill=CARD+(220,), outline=BORDER+(150,), ow=1)
-    draw.text((vx+20, y+10), "INDIA VIX", font=fnt("bold",18), fill=PURPLE)
-    draw.text((vx+20, y+34), vix_v, font=fnt("black",42), fill=TEXT)
-    draw.text((vx+20, y+80), "Fear:  " + vix_lev.upper(), font=fnt("medium",18), fill=sc(vix_lev))
+    if "gift" in geo:
+        y    = geo["gift"]
+        half = (W-78)//2
+        draw.text((44, y+34), gift_v, font=fnt("black",42), fill=TEXT)
+        draw.text((44, y+80), "Gap:  " + gift_gap + " pts", font=fnt("medium",18), fill=cc(gift_gap))
+        pill(img, draw, 24+half-180, y+10, gift_sig.replace("_"," ").upper(), sc(gift_sig))
 
-    y += 118
+        vx = 24+half+28
+        draw.text((vx+20, y+34), vix_v, font=fnt("black",42), fill=TEXT)
+        draw.text((vx+20, y+80), "Fear:  " + vix_lev.upper(), font=fnt("medium",18), fill=sc(vix_lev))
 
     # ── PIVOT LEVELS ──────────────────────────────────────────────────────────
-    draw.text((24, y+4), "KEY LEVELS", font=fnt("bold",18), fill=MUTED)
-    y += 30
+    y = geo["pivots"] + 30
 
-    pivots  = [("R2",r2,RED),("R1",r1,RED),("PP",pp_,ACCENT),("S1",s1_,GREEN),("S2",s2_,GREEN)]
     cw_piv  = (W-52-32)//5
-    for i,(lbl_,val,col) in enumerate(pivots):
+    for i,(lbl_,col) in enumerate(PIVOT_COLS):
         cx  = 24+i*(cw_piv+8)
-        is_pp = lbl_=="PP"
-        rr(img, cx, y, cx+cw_piv, y+82, r=12,
-           fill=col+(35 if is_pp else 18,), outline=col+(90 if is_pp else 55,),
-           ow=2 if is_pp else 1)
-        lw_ = tw(draw, lbl_, fnt("bold",17))
-        draw.text((cx+(cw_piv-lw_)//2, y+8), lbl_, font=fnt("bold",17), fill=col)
+        val = pivot_v[lbl_]
         # auto-size value
-        sz = 24
-        vf = fnt("black", sz)
-        while tw(draw, val, vf) > cw_piv-12 and sz>14:
-            sz -= 1
-            vf  = fnt("black", sz)
-        vw_ = tw(draw, val, vf)
-        draw.text((cx+(cw_piv-vw_)//2, y+34), val, font=vf, fill=col)
-
-    y += 94
+        vf, vbox = fit(val, "black", cw_piv-12, 1, 24, 14)
+        val, _, vw_ = vbox[0] if vbox else (val, 0, 0)
+        draw.text((cx+(cw_piv-int(vw_))//2, y+34), val, font=vf, fill=col)
 
     # ── NEWS ──────────────────────────────────────────────────────────────────
-    draw.text((24, y+2), "MARKET NEWS", font=fnt("bold",18), fill=MUTED)
-    y += 28
+    y = geo.get("news", 0) + 28
 
     tag_c = {"GEO":(255,120,50),"MARKET":(0,200,255),"MACRO":(180,140,255)}
     imp_s = {"positive":"▲","negative":"▼","neutral":"●"}
@@ -257,8 +547,6 @@ def generate_card(data: dict, session: str, output_path: str = "nifty_card.png")
         ic   = imp_c.get(imp,TEXT2)
         sym  = imp_s.get(imp,"●")
 
-        rr(img, 24, y, W-24, y+54, r=10,
-           fill=(CARD2 if idx%2==0 else CARD)+(210,))
         tf   = fnt("bold",14)
         tw_t = tw(draw,tag,tf)+22
         rr(img, 40,y+11,40+tw_t,y+43, r=10, fill=tc+(28,),outline=tc+(95,),ow=1)
@@ -266,38 +554,125 @@ def generate_card(data: dict, session: str, output_path: str = "nifty_card.png")
 
         hf   = fnt("medium",18)
         hmax = W-40-tw_t-24-56
-        hl_t = hl
-        while tw(draw,hl_t,hf)>hmax and len(hl_t)>6:
-            hl_t = hl_t[:-1]
-        if hl_t!=hl: hl_t = hl_t.rstrip()+"…"
-        draw.text((40+tw_t+12,y+16), hl_t, font=hf, fill=TEXT)
+        for hl_t, _, _ in layout(hl, hf, hmax, max_lines=1)[0]:
+            draw.text((40+tw_t+12,y+16), hl_t, font=hf, fill=TEXT)
         draw.text((W-52,y+14), sym, font=fnt("black",22), fill=ic)
         y += 58
 
     # ── TRADING VERDICT ───────────────────────────────────────────────────────
-    y += 8
-    footer_h = 54
-    avail    = H-y-footer_h-14
-    rr(img, 24, y, W-24, y+avail, r=16, fill=(8,28,14,235), outline=GREEN+(95,), ow=2)
-    draw.text((46, y+12), ">> TRADING VERDICT", font=fnt("bold",20), fill=GREEN)
-    vf2    = fnt("regular",18)
-    vlines = wrap(draw, verdict, vf2, W-108)
-    for li,line in enumerate(vlines[:4]):
-        draw.text((46, y+44+li*26), line, font=vf2, fill=TEXT)
-
-    # ── FOOTER ────────────────────────────────────────────────────────────────
-    rr(img, 0, H-footer_h, W, H, r=0, fill=CARD+(230,))
-    ov3 = Image.new("RGBA",(W,H),(0,0,0,0))
-    dl  = ImageDraw.Draw(ov3)
-    dl.line([(0,H-footer_h),(W,H-footer_h)], fill=BORDER+(200,), width=1)
-    img.alpha_composite(ov3)
-    draw.text((40,H-footer_h+14), "sameerxceed.github.io/nifty-dashboard",
-              font=fnt("regular",16), fill=MUTED)
-    disc = "Not financial advice"
-    dw_  = tw(draw, disc, fnt("regular",16))
-    draw.text((W-dw_-40,H-footer_h+14), disc, font=fnt("regular",16), fill=MUTED)
-
-    img.convert("RGB").save(output_path, "PNG", optimize=True)
+    y, avail = geo["verdict"]
+    vsz, vlh = (24, 34) if H > W else (18, 26)
+    vf2      = fnt("regular", vsz)
+    vlines   = max(min(10 if H > W else 4, (avail-60)//vlh), 1)
+    for line, dy, _ in layout(verdict, vf2, W-108, max_lines=vlines, line_h=vlh)[0]:
+        draw.text((46, y+44+dy), line, font=vf2, fill=TEXT)
+
+    return img
+
+# ── ENCODING ──────────────────────────────────────────────────────────────────
+# name -> (PIL format, file extension, save options)
+ENCODE_PROFILES = {
+    "png_fast": ("PNG",  ".png",  {"compress_level": 1}),
+    "png":      ("PNG",  ".png",  {"compress_level": 6}),
+    "png_max":  ("PNG",  ".png",  {"optimize": True}),          # the old default: smallest, slowest
+    "jpeg":     ("JPEG", ".jpg",  {"quality": 92, "subsampling": 0}),   # 4:4:4 keeps text edges clean
+    "webp":     ("WEBP", ".webp", {"quality": 90, "method": 4}),
+}
+
+ENCODE_STATS = {}   # profile -> {"n", "ms", "bytes", "px"} of the latest encode, plus a running count
+UPLOAD_BPS   = float(os.environ.get("UPLOAD_BPS", "1500000"))   # assumed upload bytes/s for pick_profile
+
+# profile -> (encode ms per megapixel, encoded bytes per pixel), measured on the
+# feed cards. pick_profile starts from these; encode_model() refines them with a
+# moving average of real encodes, kept under CACHE_DIR between runs.
+ENCODE_PRIORS = {
+    "png_fast": (40.0,  0.05),
+    "png":      (50.0,  0.035),
+    "png_max":  (130.0, 0.032),
+    "jpeg":     (10.0,  0.1),
+    "webp":     (100.0, 0.02),
+}
+ENCODE_MODEL = None
+
+def encode_model():
+    global ENCODE_MODEL
+    if ENCODE_MODEL is None:
+        ENCODE_MODEL = {k: list(v) for k, v in ENCODE_PRIORS.items()}
+        try:
+            with open(os.path.join(CACHE_DIR, "encode_model.json")) as f:
+                ENCODE_MODEL.update({k: v for k, v in json.load(f).items() if k in ENCODE_PROFILES})
+        except (OSError, ValueError):
+            pass
+    return ENCODE_MODEL
+
+def save_encode_model():
+    if ENCODE_MODEL is None:
+        return
+    path = os.path.join(CACHE_DIR, "encode_model.json")
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(ENCODE_MODEL, f)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+
+def record_encode(profile, ms, size, px=None):
+    st = ENCODE_STATS.setdefault(profile, {"n": 0, "ms": 0.0, "bytes": 0})
+    st["n"] += 1
+    st["ms"], st["bytes"] = round(ms, 1), size
+    if px:
+        st["px"] = px
+        model = encode_model().setdefault(profile, [ms*1e6/px, size/px])
+        model[0] = 0.7*model[0] + 0.3*ms*1e6/px
+        model[1] = 0.7*model[1] + 0.3*size/px
+
+def encode(img, profile="png"):
+    """Card image -> encoded bytes; timing and size are recorded in ENCODE_STATS."""
+    fmt, _, opts = ENCODE_PROFILES[profile]
+    t0  = time.perf_counter()
+    buf = io.BytesIO()
+    img.convert("RGB").save(buf, fmt, **opts)
+    data = buf.getvalue()
+    add_phase("encode", t0)
+    record_encode(profile, (time.perf_counter()-t0)*1000, len(data), img.width*img.height)
+    return data
+
+def estimate_cost(profile, px, bps):
+    """Estimated encode + upload seconds for px pixels, from encode_model()."""
+    ms_mp, bpp = encode_model()[profile]
+    return ms_mp*px/1e9 + bpp*px/bps
+
+def pick_profile(img, candidates, max_bytes=None, upload_bps=None):
+    """Encode once, with the candidate of lowest estimated encode + upload time.
+    The next best is only tried when a result is over max_bytes.
+    Returns (profile, bytes)."""
+    bps = upload_bps or UPLOAD_BPS
+    px  = img.width*img.height
+    for profile in sorted(candidates, key=lambda p: estimate_cost(p, px, bps)):
+        data = encode(img, profile)
+        if not max_bytes or len(data) <= max_bytes:
+            return profile, data
+    raise ValueError("no profile in " + ", ".join(candidates) + " fits " + str(max_bytes) + " bytes")
+
+def encode_card(img, profile="png", max_bytes=None):
+    """Encode with profile (or the best of a list of profiles). Returns (profile, bytes)."""
+    if isinstance(profile, str):
+        return profile, encode(img, profile)
+    return pick_profile(img, profile, max_bytes)
+
+def save_card(img, path, profile="png", max_bytes=None):
+    """encode_card() and write the result, swapping path's extension for the
+    chosen format. Returns the written path."""
+    profile, data = encode_card(img, profile, max_bytes)
+    path = os.path.splitext(path)[0] + ENCODE_PROFILES[profile][1]
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+def generate_card(data: dict, session: str, output_path: str = "nifty_card.png",
+                  profile="png", max_bytes=None):
+    output_path = save_card(render_card(data, session), output_path, profile, max_bytes)
     print("Card saved: " + output_path)
     return output_path
 
@@ -322,21 +697,62 @@ if __name__ == "__main__":
 # ══════════════════════════════════════════════════════════════════════════════
 # 3-PERSPECTIVE CARD  (separate 1080x1080 image)
 # ══════════════════════════════════════════════════════════════════════════════
-def generate_perspective_card(data: dict, session: str,
-                               output_path: str = "nifty_perspectives.png"):
+PERSPECTIVE_VIEWS = [
+    ("BULL CASE",    GREEN,  (0,60,20,240),  (0,180,80,80),  ">"),
+    ("NEUTRAL CASE", YELLOW, (40,40,0,240),  (200,160,0,80), "="),
+    ("BEAR CASE",    RED,    (60,10,10,240), (200,40,50,80), "<"),
+]
+
+def perspective_geometry(size=(W, H)):
+    """(x1, y1, x2, y2) of the bull/neutral/bear boxes: stacked rows, or three
+    columns side by side on a wide (Open Graph) canvas."""
+    w, h   = size
+    y      = 114+102
+    bottom = h - 54 - 20
+    if w > h:
+        col_w = (w - 48 - 16) // 3
+        return [(24+i*(col_w+8), y, 24+i*(col_w+8)+col_w, bottom) for i in range(3)]
+    card_h = (h - y - 54 - 20 - 16) // 3
+    return [(24, y+i*(card_h+8), w-24, y+i*(card_h+8)+card_h) for i in range(3)]
+
+def perspective_layout(size=(W, H)):
+    W, H = size
+    ops  = header_ops(86, 248, 14, "3-View Market Analysis  ·  NSE India", W)
+    y    = 114
+    ops += [
+        ("rr",   (24, y, W-24, y+90), {"r": 16, "fill": CARD2+(230,), "outline": ACCENT+(70,), "ow": 1}),
+        ("text", (44, None, y+10), "KEY EVENT", "bold", 15, ACCENT, "l"),
+    ]
+    boxes = perspective_geometry(size)
+    for (title, col, bg_fill, border_col, arrow), (x1, y1, x2, y2) in zip(PERSPECTIVE_VIEWS, boxes):
+        tw_  = tw(_measure, title, fnt("black", 20))
+        ops += [
+            ("rr",   (x1, y1, x2, y2),    {"r": 18, "fill": bg_fill, "outline": border_col, "ow": 2}),
+            ("rr",   (x1, y1, x1+12, y2), {"r": 18, "fill": col+(200,)}),
+            ("rr",   (x1+24, y1+14, x1+24+tw_+24, y1+46), {"r": 10, "fill": col+(40,), "outline": col+(150,), "ow": 1}),
+            ("text", (x1+36, None, y1+18), title, "black", 20, col, "l"),
+            ("text", (None, x2-26, (y1+y2)//2-20), arrow, "black", 40, col+(60,), "r"),
+        ]
+    return ops + footer_ops(size=size)
+
+def render_perspective_card(data: dict, session: str, size=(W, H)):
     """
-    Generates a 3-view card: Bull / Neutral / Bear on the day's KEY event.
-    data must contain: key_event, bull_view, neutral_view, bear_view
+    Renders a 3-view card: Bull / Neutral / Bear on the day's KEY event.
+    Views are read from data["perspectives"] (as written by generate.py) or
+    from top-level key_event, bull_view, neutral_view, bear_view.
+    1080x1080 unless another size is given.
     """
+    W, H    = size
     IST     = timezone(timedelta(hours=5, minutes=30))
     now_ist = datetime.now(IST)
     TIME    = now_ist.strftime("%I:%M %p")
     DATE    = now_ist.strftime("%d %b %Y")
 
-    event        = data.get("key_event",  "Market Key Event")
-    bull_view    = data.get("bull_view",  "Bullish perspective pending.")
-    neutral_view = data.get("neutral_view","Neutral perspective pending.")
-    bear_view    = data.get("bear_view",  "Bearish perspective pending.")
+    pv           = dict(data.get("perspectives") or {}, **data)
+    event        = pv.get("key_event",  "Market Key Event")
+    view_texts   = [pv.get("bull_view",  "Bullish perspective pending."),
+                    pv.get("neutral_view","Neutral perspective pending."),
+                    pv.get("bear_view",  "Bearish perspective pending.")]
 
     nifty_p = str(data.get("nifty",{}).get("price","—"))
     nifty_c = str(data.get("nifty",{}).get("change","+0"))
@@ -344,19 +760,10 @@ def generate_perspective_card(data: dict, session: str,
     sent_l  = str(data.get("sentiment",{}).get("label","Neutral")).upper()
     sc_col  = GREEN if score>55 else RED if score<45 else YELLOW
 
-    img  = make_bg()
+    img  = chrome(perspective_layout(size), size)
     draw = ImageDraw.Draw(img)
 
     # Header
-    rr(img, 0, 0, W, 86, r=0, fill=CARD+(248,))
-    ov2 = Image.new("RGBA",(W,H),(0,0,0,0))
-    ds  = ImageDraw.Draw(ov2)
-    ds.rectangle([0,0,W,4], fill=ACCENT+(230,))
-    img.alpha_composite(ov2)
-    rr(img, 24,14,72,72, r=10, fill=(0,50,110,255), outline=ACCENT+(130,), ow=1)
-    draw.text((28,16), "NB", font=fnt("black",30), fill=WHITE)
-    draw.text((82,14), "NIFTY LIVE", font=fnt("black",30), fill=TEXT)
-    draw.text((82,50), "3-View Market Analysis  ·  NSE India", font=fnt("regular",17), fill=TEXT2)
     pc = GREEN if str(nifty_c).startswith("+") else RED
     draw.text((W-310, 14), nifty_p, font=fnt("black",30), fill=pc)
     draw.text((W-310, 50), nifty_c + "   " + sent_l, font=fnt("medium",17), fill=sc_col)
@@ -364,64 +771,103 @@ def generate_perspective_card(data: dict, session: str,
     dtw_   = tw(draw, dt_txt, fnt("light",16))
     draw.text(((W-dtw_)//2, 92), dt_txt, font=fnt("light",16), fill=MUTED)
 
-    y = 114
-
     # Key Event
-    rr(img, 24, y, W-24, y+90, r=16, fill=CARD2+(230,), outline=ACCENT+(70,), ow=1)
-    draw.text((44, y+10), "KEY EVENT", font=fnt("bold",15), fill=ACCENT)
-    ef     = fnt("black", 24)
-    elines = wrap(draw, event, ef, W-100)
-    for li, line in enumerate(elines[:2]):
-        draw.text((44, y+32+li*30), line, font=ef, fill=WHITE)
-
-    y += 102
-
-    footer_h = 54
-    avail_h  = H - y - footer_h - 20
-    card_h   = (avail_h - 16) // 3
-
-    views = [
-        ("BULL CASE",    GREEN,  (0,60,20,240),  (0,180,80,80),   bull_view,   ">"),
-        ("NEUTRAL CASE", YELLOW, (40,40,0,240),  (200,160,0,80),  neutral_view,"="),
-        ("BEAR CASE",    RED,    (60,10,10,240), (200,40,50,80),   bear_view,   "<"),
-    ]
+    ef, eboxes = fit(event, "black", W-100, max_lines=2, size=24, min_size=20, line_h=30)
+    for line, dy, _ in eboxes:
+        draw.text((44, 114+32+dy), line, font=ef, fill=WHITE)
+
+    # Views
+    vsz = 26 if H > W else 20   # story boxes are ~500px tall: larger text instead of blank space
+    vf  = fnt("regular", vsz)
+    for view_text, (x1, y1, x2, y2) in zip(view_texts, perspective_geometry(size)):
+        text_area = y2 - y1 - 68
+        vboxes, _ = layout(view_text, vf, x2-x1-60, max_lines=text_area//(vsz+8))
+        lh        = min(text_area // max(len(vboxes),1), vsz+14)
+        for li, (line, _, _) in enumerate(vboxes):
+            draw.text((x1+24, y1+56+li*lh), line, font=vf, fill=TEXT)
 
-    for i, (title, col, bg_fill, border_col, view_text, arrow) in enumerate(views):
-        cy = y + i*(card_h+8)
-        rr(img, 24, cy, W-24, cy+card_h, r=18, fill=bg_fill, outline=border_col, ow=2)
-        ov_bar = Image.new("RGBA",(W,H),(0,0,0,0))
-        db     = ImageDraw.Draw(ov_bar)
-        db.rounded_rectangle([24, cy, 36, cy+card_h], radius=18, fill=col+(200,))
-        img.alpha_composite(ov_bar)
-        d2  = ImageDraw.Draw(img)
-        tf  = fnt("black", 20)
-        tw_ = tw(d2, title, tf)
-        rr(img, 48, cy+14, 48+tw_+24, cy+46, r=10, fill=col+(40,), outline=col+(150,), ow=1)
-        d2.text((60, cy+18), title, font=tf, fill=col)
-        vf     = fnt("regular", 20)
-        vlines = wrap(d2, view_text, vf, W-108)
-        text_area = card_h - 68
-        max_lines = min(len(vlines), text_area//28)
-        lh        = min(text_area // max(max_lines,1), 34)
-        for li, line in enumerate(vlines[:max_lines]):
-            d2.text((48, cy+56+li*lh), line, font=vf, fill=TEXT)
-        aw = tw(d2, arrow, fnt("black",40))
-        d2.text((W-50-aw, cy+card_h//2-20), arrow, font=fnt("black",40), fill=col+(60,))
-
-    # Footer
-    fy = H - footer_h
-    rr(img, 0, fy, W, H, r=0, fill=CARD+(230,))
-    ov3 = Image.new("RGBA",(W,H),(0,0,0,0))
-    dl  = ImageDraw.Draw(ov3)
-    dl.line([(0,fy),(W,fy)], fill=BORDER+(200,), width=1)
-    img.alpha_composite(ov3)
-    df = ImageDraw.Draw(img)
-    df.text((40,fy+14), "sameerxceed.github.io/nifty-dashboard",
-            font=fnt("regular",16), fill=MUTED)
-    disc = "Not financial advice"
-    dw_  = tw(df, disc, fnt("regular",16))
-    df.text((W-dw_-40,fy+14), disc, font=fnt("regular",16), fill=MUTED)
-
-    img.convert("RGB").save(output_path, "PNG", optimize=True)
+    return img
+
+def generate_perspective_card(data: dict, session: str,
+                               output_path: str = "nifty_perspectives.png",
+                               profile="png", max_bytes=None):
+    output_path = save_card(render_perspective_card(data, session), output_path, profile, max_bytes)
     print("Perspectives card saved: " + output_path)
     return output_path
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# BATCH RENDER  (several templates × sizes in parallel)
+# ══════════════════════════════════════════════════════════════════════════════
+TEMPLATES = {
+    "main":         render_card,
+    "perspectives": render_perspective_card,
+}
+
+SIZES = {
+    "feed":  (1080, 1080),
+    "story": (1080, 1920),
+    "og":    (1200, 630),
+}
+
+def render_target(template, size, data, session):
+    """One template laid out natively at size (w, h): taller canvases get more
+    rows and larger text, wider ones a landscape arrangement (see main_geometry
+    and perspective_geometry)."""
+    return TEMPLATES[template](data, session, tuple(size))
+
+def _render_job(job):
+    template, size, data, session, path, profile, max_bytes = job
+    ENCODE_STATS.clear()
+    img = render_target(template, size, data, session)
+    if path is None:
+        out = encode_card(img, profile, max_bytes)
+    else:
+        out = save_card(img, path, profile, max_bytes)
+    return out, ENCODE_STATS.copy()   # worker stats travel back to the parent
+
+def render_batch(data: dict, session: str, targets, out_dir: str = ".", workers: int = None,
+                 profile="png", max_bytes=None):
+    """Render every (template, size) in targets in a process pool.
+
+    size is a (w, h) tuple or a key of SIZES; profile/max_bytes are as for
+    encode_card. Returns {(template, (w, h)): path} in target order, or with
+    out_dir=None {(template, (w, h)): (profile, bytes)} and nothing touches
+    the disk. Wall time is roughly that of the slowest single card.
+    """
+    jobs = []
+    for template, size in targets:
+        w, h = SIZES.get(size, size)
+        name = "nifty_" + template + "_" + str(w) + "x" + str(h) + ".png"
+        path = os.path.join(out_dir, name) if out_dir is not None else None
+        jobs.append((template, (w, h), data, session, path, profile, max_bytes))
+    for size in {j[1] for j in jobs}:
+        make_bg(*size)   # build/load the backgrounds once, before the workers fork
+
+    # Workers are forked: callers such as post_to_instagram.py run at module top
+    # level, so a spawn/forkserver child re-importing __main__ would rerun them.
+    pooled = len(jobs) > 1 and "fork" in multiprocessing.get_all_start_methods()
+    if pooled:
+        try:
+            from concurrent.futures import ProcessPoolExecutor
+            from concurrent.futures.process import BrokenProcessPool
+            with ProcessPoolExecutor(max_workers=workers or min(len(jobs), os.cpu_count() or 1),
+                                     mp_context=multiprocessing.get_context("fork")) as ex:
+                results = list(ex.map(_render_job, jobs))
+        except (OSError, ImportError, BrokenProcessPool) as e:   # no process support (e.g. sandboxed runner)
+            print("Process pool unavailable, rendering serially: " + str(e))
+            pooled  = False
+            results = [_render_job(j) for j in jobs]
+    else:
+        results = [_render_job(j) for j in jobs]
+
+    out = {}
+    for job, (res, stats) in zip(jobs, results):
+        for prof, st in stats.items():
+            # serial jobs already updated encode_model() in this process
+            record_encode(prof, st["ms"], st["bytes"], st.get("px") if pooled else None)
+        out[(job[0], job[1])] = res
+        if job[4] is not None:
+            print("Card saved: " + res)
+    save_encode_model()
+    return out
@@ -1,8 +1,9 @@
-import os, json, re, urllib.request
+import os, json, re, hashlib, urllib.request
 from datetime import datetime
 import pytz
 
 GEMINI_API_KEY = os.environ["GEMINI_API_KEY"]
+QUOTE_PROXY_URL = os.environ.get("QUOTE_PROXY_URL", "")   # quote_proxy.py base URL for the live page; empty = Yahoo directly
 GEMINI_URL = (
     "https://generativelanguage.googleapis.com/v1beta/models/"
     "gemini-2.0-flash:generateContent?key=" + GEMINI_API_KEY
@@ -360,6 +361,7 @@ data["session"]       = SESSION
 data["session_label"] = SESSION_LABELS.get(SESSION, SESSION)
 data["updated_time"]  = TIME
 data["updated_date"]  = TODAY
+data["generated_at"]  = int(now_ist.timestamp())
 
 prev_sessions = prev_data.get("all_sessions", [])
 new_entry = {
@@ -371,14 +373,89 @@ new_entry = {
 }
 data["all_sessions"] = [s for s in prev_sessions if s.get("session") != SESSION] + [new_entry]
 
+# ── SESSION DELTA (data.delta.json) ───────────────────────────────────────────
+# Content revision of the snapshot, plus a JSON-Patch style op list that turns the
+# previous data.json into this one. The page keeps the last snapshot and only
+# downloads the delta when its revision matches "base".
+
+def data_rev(d):
+    body = json.dumps({k: v for k, v in d.items() if k != "rev"}, sort_keys=True)
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()[:12]
+
+def json_ptr(path):
+    return "".join("/" + str(p).replace("~","~0").replace("/","~1") for p in path)
+
+def json_diff(old, new, path=()):
+    """Ops turning old into new. Dicts recurse; lists and scalars are replaced whole."""
+    ops = []
+    for k in old:
+        if k not in new:
+            ops.append({"op":"remove","path":json_ptr(path+(k,))})
+    for k, v in new.items():
+        if k not in old:
+            ops.append({"op":"add","path":json_ptr(path+(k,)),"value":v})
+        elif isinstance(v, dict) and isinstance(old[k], dict):
+            ops += json_diff(old[k], v, path+(k,))
+        elif v != old[k]:
+            ops.append({"op":"replace","path":json_ptr(path+(k,)),"value":v})
+    return ops
+
+data["rev"] = data_rev(data)
+prev_rev    = prev_data.get("rev")
+delta = {
+    "base": prev_rev,
+    "rev":  data["rev"],
+    "ops":  json_diff(prev_data, data) if prev_data else [],
+}
+
 # Always save whatever data we have, even partial
 try:
     with open("data.json","w") as f:
         json.dump(data, f, indent=2)
-    print("data.json saved")
+    print("data.json saved (rev " + data["rev"] + ")")
+    with open("data.delta.json","w") as f:
+        json.dump(delta, f, separators=(",",":"))
+    print("data.delta.json saved (" + str(len(delta["ops"])) + " ops from " + str(prev_rev) + ")")
 except Exception as e:
     print("Warning: could not save data.json: " + str(e))
 
+# ── BROWSER AI PAYLOAD (ai.json) ──────────────────────────────────────────────
+# Same shape the page's combined Gemini prompt returns, so visitors render this
+# static file instead of each triggering an LLM call and an NSE scrape.
+def is_num(v):
+    try:
+        float(str(v).replace(",",""))
+        return True
+    except ValueError:
+        return False
+
+pv_d  = data.get("pivot", {})
+fii_d = data.get("fiidii", {})
+ai_payload = {
+    "generated_at": int(now_ist.timestamp()),
+    "session":      SESSION,
+    "rev":          data["rev"],
+    "news":         data.get("news", []),
+    "oi":           data.get("oi", {}),
+    "sentiment":    data.get("sentiment", {}),
+    "perspectives": data.get("perspectives", {}),
+    "brief":        data.get("intraday_analysis") or data.get("brief", ""),
+}
+if is_num(pv_d.get("s1")) and is_num(pv_d.get("r1")):
+    ai_payload["morning_range"] = {
+        "low":  pv_d["s1"], "high": pv_d["r1"],
+        "bias": data.get("morning_prediction", {}).get("bias", "Neutral"),
+    }
+if is_num(fii_d.get("fii", {}).get("net")):
+    ai_payload["fiidii"] = {"fii": fii_d["fii"], "dii": fii_d.get("dii", {})}
+
+try:
+    with open("ai.json","w") as f:
+        json.dump(ai_payload, f, separators=(",",":"))
+    print("ai.json saved")
+except Exception as e:
+    print("Warning: could not save ai.json: " + str(e))
+
 # ── HTML BUILDER ──────────────────────────────────────────────────────────────
 
 def sig_color(v):
@@ -688,9 +765,139 @@ function fmt(n,d=2){return n==null?"\u2014":Number(n).toLocaleString("en-IN",{mi
 function fmtChg(n){if(n==null)return"\u2014";return(n>=0?"+":"")+fmt(n,2);}
 function fmtPct(n){if(n==null)return"\u2014";return(n>=0?"+":"")+fmt(n,2)+"%";}
 function col(n){return n>0?"#00f088":n<0?"#ff3355":"#7a9cbf";}
-function setEl(id,v){const e=document.getElementById(id);if(e)e.textContent=v;}
-function setHTML(id,v){const e=document.getElementById(id);if(e)e.innerHTML=v;}
-function setC(id,c){const e=document.getElementById(id);if(e)e.style.color=c;}
+// Writes are diffed against the last value rendered and flushed once per frame.
+const shown={},queued={};let frame=0;
+function put(id,prop,v){
+  const k=id+"|"+prop;
+  if(shown[k]===v){delete queued[k];return;}
+  queued[k]=[id,prop,v];
+  if(!frame)frame=requestAnimationFrame(flush);
+}
+function flush(){
+  frame=0;
+  for(const k in queued){
+    const[id,prop,v]=queued[k];delete queued[k];
+    const e=document.getElementById(id);if(!e)continue;
+    if(prop==="color")e.style.color=v;else if(prop==="width")e.style.width=v;else e[prop]=v;
+    shown[k]=v;
+  }
+}
+function setEl(id,v){put(id,"textContent",String(v));}
+function setHTML(id,v){put(id,"innerHTML",v);}
+function setC(id,c){put(id,"color",c);}
+
+// DATA SNAPSHOT — the page is built from one data.json revision (gen-time
+// data-rev). data.delta.json says whether a newer one exists; keep the last
+// snapshot locally and move it forward with the delta, fetching the full
+// data.json only when the delta does not start from the revision we hold.
+const DATA_URL="data.json",DELTA_URL="data.delta.json",SNAP_KEY="nifty_data_snapshot";
+let snap=null,shownRev=null;
+try{snap=JSON.parse(localStorage.getItem(SNAP_KEY)||"null");}catch(e){snap=null;}
+function saveSnap(){try{localStorage.setItem(SNAP_KEY,JSON.stringify(snap));}catch(e){}}
+
+function applyDelta(doc,ops){
+  for(const op of ops){
+    const keys=op.path.split("/").slice(1).map(k=>k.replace(/~1/g,"/").replace(/~0/g,"~"));
+    const last=keys.pop();
+    let t=doc;
+    for(const k of keys){
+      if(t[k]==null||typeof t[k]!=="object")throw new Error("bad delta path "+op.path);
+      t=t[k];
+    }
+    if(op.op==="remove")delete t[last];
+    else t[last]=op.value;
+  }
+  return doc;
+}
+
+// true when snap now holds a revision the page is not showing
+async function syncData(){
+  try{
+    const r=await fetch(DELTA_URL,{cache:"no-cache"});
+    if(!r.ok)throw new Error("HTTP "+r.status);
+    const dl=await r.json();
+    if(dl.rev===shownRev)return false;
+    if(snap&&snap.rev===dl.rev)return true;
+    if(snap&&dl.base===snap.rev){
+      try{
+        const next=applyDelta(JSON.parse(JSON.stringify(snap)),dl.ops||[]);
+        if(next.rev===dl.rev){snap=next;saveSnap();return true;}
+      }catch(e){console.warn("delta apply failed, fetching full data.json:",e.message);}
+    }
+    const f=await fetch(DATA_URL,{cache:"no-cache"});
+    if(!f.ok)throw new Error("HTTP "+f.status);
+    snap=await f.json();saveSnap();
+    return snap.rev!==shownRev;
+  }catch(e){console.warn("data sync failed:",e.message);return false;}
+}
+
+function esc(s){return String(s==null?"":s).replace(/&/g,"&amp;").replace(/</g,"&lt;").replace(/>/g,"&gt;");}
+const TAG_C={GEO:"#ff6b35",MARKET:"#00c8ff",MACRO:"#b388ff",SECTOR:"#ffd600"};
+const IMP={positive:["▲","#00f088"],negative:["▼","#ff3355"],neutral:["●","#7a9cbf"]};
+const VIEWS=[["bull","▲ BULL","0,240,136","#00f088","#8abf9a"],["neutral","● NEUTRAL","255,214,0","#ffd600","#bfb870"],["bear","▼ BEAR","255,51,85","#ff3355","#bf8a8a"]];
+// same markup as news_items() in generate.py
+function newsHTML(items){
+  return items.map(n=>{
+    const tc=TAG_C[n.tag]||"#00c8ff",im=IMP[n.impact]||IMP.neutral;
+    let h="<div style='padding:10px 0;border-bottom:1px solid #182236'><div style='display:flex;align-items:flex-start;gap:6px;flex-wrap:wrap'>"
+      +"<span style='font-size:9px;font-weight:700;padding:2px 7px;border-radius:3px;white-space:nowrap;background:"+tc+"22;color:"+tc+"'>"+esc(n.tag||"MARKET")+"</span>"
+      +"<span style='font-size:12px;color:#d8eeff;line-height:1.5;flex:1'>"+esc(n.headline)+"</span>"
+      +"<span style='color:"+im[1]+";font-size:13px;font-weight:700'>"+im[0]+"</span>"
+      +(n.time?"<span style='font-size:9px;color:#2a3d58;white-space:nowrap'>"+esc(n.time)+"</span>":"")+"</div>";
+    const views=VIEWS.filter(v=>n[v[0]]);
+    if(views.length)h+="<div style='display:flex;gap:5px;margin-top:7px;flex-wrap:wrap'>"+views.map(v=>
+      "<div style='flex:1;min-width:120px;background:rgba("+v[2]+",0.06);border:1px solid rgba("+v[2]+",0.2);border-radius:6px;padding:5px 8px'>"
+      +"<div style='font-size:8px;font-weight:700;color:"+v[3]+";letter-spacing:0.8px;margin-bottom:3px'>"+v[1]+"</div>"
+      +"<div style='font-size:10px;color:"+v[4]+";line-height:1.5'>"+esc(n[v[0]])+"</div></div>").join("")+"</div>";
+    return h+"</div>";
+  }).join("");
+}
+
+// Re-render the sections that change between sessions; the rest of the page
+// is refreshed by the hourly reload.
+function renderData(d){
+  const s=d.sentiment||{};
+  if(s.score!=null){
+    const sc=Math.round(Number(s.score)),c=sc>55?"#00f088":sc<45?"#ff3355":"#ffcc00";
+    setEl("sent-score",sc);setC("sent-score",c);setEl("sent-label",s.label||"—");put("sent-bar","width",sc+"%");
+  }
+  const oi=d.oi||{};
+  if(oi.max_pain){
+    setEl("oi-maxpain",oi.max_pain);setEl("oi-pcr",oi.pcr??"—");
+    setEl("oi-ce",oi.top_ce_strike??"—");setEl("oi-pe",oi.top_pe_strike??"—");
+  }
+  const f=d.fiidii||{};
+  for(const k of["fii","dii"])if(f[k]&&f[k].net!=null){
+    setEl(k+"-net","Net Rs."+f[k].net+"Cr");setC(k+"-net",String(f[k].net).startsWith("+")?"#00f088":"#ff3355");
+  }
+  if(d.news&&d.news.length)setHTML("news-list",newsHTML(d.news));
+  const p=d.perspectives||{};
+  if(p.key_event){
+    setEl("persp-event",p.key_event);setEl("persp-bull",p.bull_view||"");
+    setEl("persp-neutral",p.neutral_view||"");setEl("persp-bear",p.bear_view||"");
+  }
+  if(d.rev)shownRev=d.rev;
+  const g=document.getElementById("gen-time");
+  if(g&&d.generated_at){
+    g.setAttribute("data-ts",d.generated_at);
+    const b=document.getElementById("stale-banner");if(b)b.style.display="none";
+    checkStale();
+  }
+}
+
+async function refreshData(){if(await syncData())renderData(snap);}
+
+// ai.json has the same shape for the AI sections; a page served from cache that
+// predates the latest run renders it straight away.
+async function loadStaticAI(){
+  try{
+    const r=await fetch("ai.json",{cache:"no-cache"});
+    if(!r.ok)throw new Error("HTTP "+r.status);
+    const d=await r.json();
+    const g=document.getElementById("gen-time");
+    if(d.generated_at>Number(g&&g.getAttribute("data-ts")||0))renderData(d);
+  }catch(e){console.warn("ai.json unavailable:",e.message);}
+}
 
 function stamp(){
   const n=new Date();
@@ -703,7 +910,7 @@ function market(){
   const n=new Date(),ist=new Date(n.getTime()+5.5*3600000);
   const h=ist.getUTCHours(),m=ist.getUTCMinutes(),d=ist.getUTCDay();
   if(d===0||d===6)return false;
-  const t=h*60+m;return t>=9*15&&t<=15*30;
+  const t=h*60+m;return t>=9*60+15&&t<=15*60+30;
 }
 
 async function fetch_yf(syms){
@@ -715,40 +922,136 @@ async function fetch_yf(syms){
   }
 }
 
-async function poll(){
-  stamp();
-  try{
-    const qs=await fetch_yf("%5ENSEI,%5ENSEBANK,%5EINDIAVIX");
-    if(!qs.length)return;
-    const nifty=qs.find(q=>q.symbol.includes("NSEI")&&!q.symbol.includes("BANK"))||qs[0];
-    const bank =qs.find(q=>q.symbol.includes("BANK"));
-    const vix  =qs.find(q=>q.symbol.includes("INDIAVIX"));
-    const c=col(nifty.regularMarketChange);
-    setEl("live-price", fmt(nifty.regularMarketPrice,2));
-    setEl("live-chg",   fmtChg(nifty.regularMarketChange)+" ("+fmtPct(nifty.regularMarketChangePercent)+")");
-    setEl("live-high",  fmt(nifty.regularMarketDayHigh,2));
-    setEl("live-low",   fmt(nifty.regularMarketDayLow,2));
-    setC("live-price",c); setC("live-chg",c);
-    if(vix){
-      const vc=vix.regularMarketPrice>16?"#ff3355":vix.regularMarketPrice>12?"#ffcc00":"#00f088";
-      setEl("live-vix",fmt(vix.regularMarketPrice,2)); setC("live-vix",vc);
-    }
-    // ticker strip
-    const parts=qs.map(q=>{
-      const qc=col(q.regularMarketChange);
-      return "<span style='margin-right:20px;white-space:nowrap'>"
-        +"<span style='color:#4a6a8a;font-size:9px'>"+( q.shortName||q.symbol)+"</span> "
-        +"<span style='color:"+qc+";font-weight:700'>"+fmt(q.regularMarketPrice,2)+"</span>"
-        +" <span style='color:"+qc+";font-size:10px'>"+fmtChg(q.regularMarketChange)+" ("+fmtPct(q.regularMarketChangePercent)+")</span>"
-        +"</span>";
-    });
-    setHTML("live-ticker",parts.join("<span style='color:#182236'>|</span>"));
-    const b=document.getElementById("live-badge");
-    if(b){b.style.display="inline-flex";b.textContent="● LIVE";b.style.color="#00f088";}
-  }catch(e){
-    const b=document.getElementById("live-badge");
-    if(b){b.style.color="#ffcc00";b.textContent="○ Delayed";}
+// LIVE QUOTES — from quote_proxy.py when the page names one (meta quote-proxy,
+// or ?proxy=URL), else straight from Yahoo. Proxy quotes are mapped to Yahoo's
+// field names; a stale proxy answer is only shown when Yahoo fails too.
+const QUOTE_PROXY=(function(){
+  const u=new URLSearchParams(location.search).get("proxy")
+    ||(document.querySelector('meta[name="quote-proxy"]')||{}).content||"";
+  return u.endsWith("/")?u.slice(0,-1):u;
+})();
+const LIVE_SYMS=["NSEI","NSEBANK","INDIAVIX"];
+function yfShape(q){
+  if(q.regularMarketPrice!=null)return q;
+  return{symbol:q.symbol,shortName:q.shortName||q.name,regularMarketPrice:q.price,regularMarketChange:q.change,
+    regularMarketChangePercent:q.changePct,regularMarketDayHigh:q.high,regularMarketDayLow:q.low};
+}
+function pick(qs){return qs.map(yfShape).filter(q=>q.symbol&&LIVE_SYMS.some(s=>q.symbol.includes(s)));}
+
+// [quotes, fresh]
+async function fetchQuotes(){
+  let stale=[];
+  if(QUOTE_PROXY){
+    try{
+      const r=await fetch(QUOTE_PROXY+"/quotes");
+      if(!r.ok)throw 0;
+      const d=await r.json();
+      const qs=d.ok&&d.quotes?pick(d.quotes):[];
+      if(qs.length&&!d.stale)return[qs,true];
+      stale=qs;   // proxy lost upstream: try Yahoo, else show what it had
+    }catch(e){}
+  }
+  const qs=await fetch_yf("%5ENSEI,%5ENSEBANK,%5EINDIAVIX");
+  return qs.length?[qs,true]:[stale,false];
+}
+
+function badge(live){
+  const b=document.getElementById("live-badge");
+  if(!b)return;
+  if(live){b.style.display="inline-flex";b.textContent="● LIVE";b.style.color="#00f088";}
+  else{b.style.color="#ffcc00";b.textContent="○ Delayed";}
+}
+
+function renderQuotes(qs){
+  const nifty=qs.find(q=>q.symbol.includes("NSEI")&&!q.symbol.includes("BANK"))||qs[0];
+  const vix  =qs.find(q=>q.symbol.includes("INDIAVIX"));
+  const c=col(nifty.regularMarketChange);
+  setEl("live-price", fmt(nifty.regularMarketPrice,2));
+  setEl("live-chg",   fmtChg(nifty.regularMarketChange)+" ("+fmtPct(nifty.regularMarketChangePercent)+")");
+  setEl("live-high",  fmt(nifty.regularMarketDayHigh,2));
+  setEl("live-low",   fmt(nifty.regularMarketDayLow,2));
+  setC("live-price",c); setC("live-chg",c);
+  if(vix){
+    const vc=vix.regularMarketPrice>16?"#ff3355":vix.regularMarketPrice>12?"#ffcc00":"#00f088";
+    setEl("live-vix",fmt(vix.regularMarketPrice,2)); setC("live-vix",vc);
   }
+  // ticker strip
+  const parts=qs.map(q=>{
+    const qc=col(q.regularMarketChange);
+    return "<span style='margin-right:20px;white-space:nowrap'>"
+      +"<span style='color:#4a6a8a;font-size:9px'>"+esc(q.shortName||q.symbol)+"</span> "
+      +"<span style='color:"+qc+";font-weight:700'>"+fmt(q.regularMarketPrice,2)+"</span>"
+      +" <span style='color:"+qc+";font-size:10px'>"+fmtChg(q.regularMarketChange)+" ("+fmtPct(q.regularMarketChangePercent)+")</span>"
+      +"</span>";
+  });
+  setHTML("live-ticker",parts.join("<span style='color:#182236'>|</span>"));
+}
+
+// QUOTE STREAM — with a proxy, quotes are pushed over SSE during market hours
+// and poll() stops fetching them; while the stream is down, polling takes over.
+let stream=null,streaming=false;
+function startStream(){
+  if(!QUOTE_PROXY||!window.EventSource||stream)return;
+  stream=new EventSource(QUOTE_PROXY+"/stream");
+  stream.addEventListener("quotes",function(ev){
+    try{
+      const d=JSON.parse(ev.data);
+      if(d.stale){streaming=false;badge(false);return;}   // proxy lost upstream: polling takes over
+      const qs=d.quotes?pick(d.quotes):[];
+      if(qs.length){streaming=true;renderQuotes(qs);badge(true);stamp();}
+    }catch(e){console.warn("Bad stream event:",e.message);}
+  });
+  stream.onerror=function(){
+    streaming=false;
+    if(stream&&stream.readyState===EventSource.CLOSED)stream=null;
+  };
+}
+function stopStream(){if(stream){stream.close();stream=null;}streaming=false;}
+
+// true when fresh quotes are on screen. Outside market hours only the first
+// poll after the close fetches; the closing quotes stand until the next open.
+let wasOpen=true;
+async function pollOnce(){
+  stamp();
+  const open=market();
+  if(open)startStream();else stopStream();
+  if(!open&&!wasOpen)return true;
+  wasOpen=open;
+  if(streaming)return true;
+  const[qs,fresh]=await fetchQuotes();
+  if(qs.length)renderQuotes(qs);
+  badge(fresh);
+  return fresh;
+}
+
+// SCHEDULER — one quote timer that stops while the tab is hidden, backs off
+// after failed polls and wakes at the market open and just after the close.
+const BOUNDARIES=[9*60+15,15*60+31];
+const MARKET_EVERY=60000,IDLE_EVERY=15*60000,BACKOFF_MAX=15*60000;
+let pollTimer=0,polling=false,failures=0;
+
+function msToBoundary(){
+  const n=new Date(),ist=new Date(n.getTime()+5.5*3600000),d=ist.getUTCDay();
+  const now=ist.getUTCHours()*3600+ist.getUTCMinutes()*60+ist.getUTCSeconds();
+  if(d!==0&&d!==6)for(const b of BOUNDARIES)if(b*60>now)return(b*60-now)*1000+5000;
+  return IDLE_EVERY;
+}
+function nextDelay(){
+  const base=market()?MARKET_EVERY:IDLE_EVERY;
+  const wait=failures?Math.min(base*2**failures,BACKOFF_MAX):base;
+  return Math.max(1000,Math.min(wait,msToBoundary()));
+}
+function schedule(){
+  clearTimeout(pollTimer);
+  pollTimer=document.hidden?0:setTimeout(poll,nextDelay());
+}
+async function poll(){
+  if(polling)return;   // an in-flight poll reschedules itself
+  polling=true;
+  let ok=false;
+  try{ok=await pollOnce();}
+  catch(e){console.warn("poll failed:",e.message);}
+  finally{failures=ok?0:failures+1;polling=false;schedule();}
 }
 
 function countdown(){
@@ -777,16 +1080,26 @@ function checkStale(){
     bannerEl.style.display = "block";
     bannerEl.innerHTML = "⚠ Dashboard data is " + Math.floor(ageHours) + "h old — last GitHub Actions run may have failed. "
       + "Live price is fetched directly below. "
-      + "<a href=\"https://github.com/Sameerxceed/nifty-morning-brief/actions\" target=\"_blank\" "
-      + "style=\"color:#00c8ff\">Check Actions log →</a>";
+      + "<a href='https://github.com/Sameerxceed/nifty-morning-brief/actions' target='_blank' "
+      + "style='color:#00c8ff'>Check Actions log →</a>";
   }
 }
 
+// Hidden tabs drop the quote timer and stream; coming back refreshes once.
+document.addEventListener("visibilitychange",function(){
+  if(document.hidden){clearTimeout(pollTimer);pollTimer=0;stopStream();}
+  else{poll();countdown();refreshData();}
+});
+
 window.addEventListener("DOMContentLoaded",function(){
   poll();
   checkStale();
-  setInterval(function(){if(market())poll();else stamp();},60000);
-  setInterval(countdown,1000);
+  const g=document.getElementById("gen-time");
+  shownRev=g&&g.getAttribute("data-rev");
+  loadStaticAI();
+  // sessions are hours apart; a delta check every 5 min is a few hundred bytes
+  setInterval(function(){if(!document.hidden)refreshData();},300000);
+  setInterval(function(){if(!document.hidden)countdown();},1000);
   countdown();
 });
 })();
@@ -807,22 +1120,22 @@ def perspectives_section(data):
         '<div class="sec">3-View Analysis &#x2014; Key Event</div>'
         '<div style="background:#0b1220;border:1px solid #1e3050;border-radius:12px;padding:16px 20px;margin-bottom:16px">'
         '<div style="font-size:10px;color:#2a3d58;font-weight:700;letter-spacing:1px;margin-bottom:4px">KEY EVENT</div>'
-        '<div style="font-size:14px;font-weight:700;color:#d8eeff;margin-bottom:16px">' + event + '</div>'
+        '<div id="persp-event" style="font-size:14px;font-weight:700;color:#d8eeff;margin-bottom:16px">' + event + '</div>'
         '<div style="display:grid;grid-template-columns:repeat(3,1fr);gap:10px">'
         # Bull
         '<div style="background:rgba(0,240,136,0.05);border:1px solid rgba(0,240,136,0.2);border-radius:10px;padding:14px">'
         '<div style="font-size:9px;font-weight:700;color:#00f088;letter-spacing:1px;margin-bottom:8px">▲ BULL CASE</div>'
-        '<div style="font-size:12px;color:#7abf8a;line-height:1.7">' + bull + '</div>'
+        '<div id="persp-bull" style="font-size:12px;color:#7abf8a;line-height:1.7">' + bull + '</div>'
         '</div>'
         # Neutral
         '<div style="background:rgba(255,214,0,0.05);border:1px solid rgba(255,214,0,0.2);border-radius:10px;padding:14px">'
         '<div style="font-size:9px;font-weight:700;color:#ffd600;letter-spacing:1px;margin-bottom:8px">● NEUTRAL CASE</div>'
-        '<div style="font-size:12px;color:#bfb080;line-height:1.7">' + neut + '</div>'
+        '<div id="persp-neutral" style="font-size:12px;color:#bfb080;line-height:1.7">' + neut + '</div>'
         '</div>'
         # Bear
         '<div style="background:rgba(255,51,85,0.05);border:1px solid rgba(255,51,85,0.2);border-radius:10px;padding:14px">'
         '<div style="font-size:9px;font-weight:700;color:#ff3355;letter-spacing:1px;margin-bottom:8px">▼ BEAR CASE</div>'
-        '<div style="font-size:12px;color:#bf7a7a;line-height:1.7">' + bear + '</div>'
+        '<div id="persp-bear" style="font-size:12px;color:#bf7a7a;line-height:1.7">' + bear + '</div>'
         '</div>'
         '</div>'
         '</div>'
@@ -832,6 +1145,7 @@ html_parts = [
     '<!DOCTYPE html><html lang="en"><head>',
     '<meta charset="UTF-8"><meta name="viewport" content="width=device-width,initial-scale=1.0">',
     '<meta http-equiv="refresh" content="3600">',
+    '<meta name="quote-proxy" content="' + esc(QUOTE_PROXY_URL) + '">',
     '<title>Nifty Live Dashboard - ' + TODAY + '</title>',
     '<link href="https://fonts.googleapis.com/css2?family=JetBrains+Mono:wght@400;500;700&display=swap" rel="stylesheet">',
     '<style>' + css + '</style>',
@@ -858,7 +1172,7 @@ html_parts = [
     '<div id="stale-banner" style="display:none;background:#1a0a00;border-left:4px solid #ff8c00;'
     'padding:10px 20px;font-size:12px;color:#ff8c00;line-height:1.5"></div>',
     # Hidden gen-time element so JS can compute data age
-    '<span id="gen-time" data-ts="' + str(int(now_ist.timestamp())) + '" style="display:none"></span>',
+    '<span id="gen-time" data-ts="' + str(int(now_ist.timestamp())) + '" data-rev="' + data["rev"] + '" style="display:none"></span>',
 
     # HERO
     '<div class="hero"><div style="max-width:1100px;margin:0 auto;display:flex;'
@@ -875,11 +1189,11 @@ html_parts = [
     '</div></div>',
     '<div style="text-align:right">',
     '<div style="font-size:10px;color:#2a3d58;font-weight:700;text-transform:uppercase;letter-spacing:1px;margin-bottom:6px">Sentiment</div>',
-    '<div style="font-size:48px;font-weight:700;line-height:1;color:' + sc_col + '">' + str(score) + '</div>',
-    '<div style="font-size:12px;color:#7a9cbf;margin-top:2px">' + esc(s.get("label","—")) + '</div>',
+    '<div id="sent-score" style="font-size:48px;font-weight:700;line-height:1;color:' + sc_col + '">' + str(score) + '</div>',
+    '<div id="sent-label" style="font-size:12px;color:#7a9cbf;margin-top:2px">' + esc(s.get("label","—")) + '</div>',
     '<div style="width:140px;margin:8px 0 0 auto">',
     '<div style="background:rgba(255,255,255,0.05);border-radius:3px;height:6px;overflow:hidden">',
-    '<div style="height:6px;width:' + str(score) + '%;background:linear-gradient(90deg,#ff3355,#ffcc00,#00f088);border-radius:3px"></div>',
+    '<div id="sent-bar" style="height:6px;width:' + str(score) + '%;background:linear-gradient(90deg,#ff3355,#ffcc00,#00f088);border-radius:3px"></div>',
     '</div>',
     '<div style="display:flex;justify-content:space-between;font-size:8px;color:#2a3d58;margin-top:3px"><span>BEAR</span><span>NEUTRAL</span><span>BULL</span></div>',
     '</div></div>',
@@ -919,12 +1233,12 @@ html_parts = [
     '<span style="color:#00d4ff;font-weight:700">FII</span>',
     '<span>Buy <strong style="color:#00f088">Rs.' + esc(fii.get("buy","—")) + 'Cr</strong></span>',
     '<span>Sell <strong style="color:#ff3355">Rs.' + esc(fii.get("sell","—")) + 'Cr</strong></span>',
-    '<strong style="color:' + fii_net_col + '">Net Rs.' + esc(fii.get("net","—")) + 'Cr</strong></div>',
+    '<strong id="fii-net" style="color:' + fii_net_col + '">Net Rs.' + esc(fii.get("net","—")) + 'Cr</strong></div>',
     '<div style="display:flex;align-items:center;justify-content:space-between;padding:8px 0;border-bottom:1px solid #182236;font-size:11px">',
     '<span style="color:#ffcc00;font-weight:700">DII</span>',
     '<span>Buy <strong style="color:#00f088">Rs.' + esc(dii.get("buy","—")) + 'Cr</strong></span>',
     '<span>Sell <strong style="color:#ff3355">Rs.' + esc(dii.get("sell","—")) + 'Cr</strong></span>',
-    '<strong style="color:' + dii_net_col + '">Net Rs.' + esc(dii.get("net","—")) + 'Cr</strong></div>',
+    '<strong id="dii-net" style="color:' + dii_net_col + '">Net Rs.' + esc(dii.get("net","—")) + 'Cr</strong></div>',
     '<div style="margin-top:10px;font-size:11px;color:#7a9cbf">Signal: <strong style="color:' + sig_color(fiidii_signal) + '">' + esc(fiidii_signal).replace("_"," ").upper() + '</strong></div>',
     '</div></div>',
 
@@ -940,21 +1254,21 @@ html_parts = [
     '<div class="g3">',
     '<div style="text-align:center;background:rgba(179,136,255,0.08);border:1px solid rgba(179,136,255,0.2);border-radius:10px;padding:12px">',
     '<div style="font-size:9px;color:#b388ff;font-weight:700;margin-bottom:4px">MAX PAIN</div>',
-    '<div style="font-size:22px;font-weight:700;font-family:monospace;color:#b388ff">' + esc(oi_d.get("max_pain","—")) + '</div>',
-    '<div style="font-size:10px;color:#7a9cbf;margin-top:4px">PCR: <strong>' + esc(oi_d.get("pcr","—")) + '</strong></div>',
+    '<div id="oi-maxpain" style="font-size:22px;font-weight:700;font-family:monospace;color:#b388ff">' + esc(oi_d.get("max_pain","—")) + '</div>',
+    '<div style="font-size:10px;color:#7a9cbf;margin-top:4px">PCR: <strong id="oi-pcr">' + esc(oi_d.get("pcr","—")) + '</strong></div>',
     '</div>',
     '<div style="text-align:center;background:rgba(255,51,85,0.08);border:1px solid rgba(255,51,85,0.2);border-radius:10px;padding:12px">',
     '<div style="font-size:9px;color:#ff3355;font-weight:700;margin-bottom:4px">MAX CALL OI</div>',
-    '<div style="font-size:22px;font-weight:700;font-family:monospace;color:#ff3355">' + esc(oi_d.get("top_ce_strike","—")) + '</div>',
+    '<div id="oi-ce" style="font-size:22px;font-weight:700;font-family:monospace;color:#ff3355">' + esc(oi_d.get("top_ce_strike","—")) + '</div>',
     '<div style="font-size:10px;color:#7a9cbf;margin-top:4px">Resistance</div>',
     '</div>',
     '<div style="text-align:center;background:rgba(0,240,136,0.08);border:1px solid rgba(0,240,136,0.2);border-radius:10px;padding:12px">',
     '<div style="font-size:9px;color:#00f088;font-weight:700;margin-bottom:4px">MAX PUT OI</div>',
-    '<div style="font-size:22px;font-weight:700;font-family:monospace;color:#00f088">' + esc(oi_d.get("top_pe_strike","—")) + '</div>',
+    '<div id="oi-pe" style="font-size:22px;font-weight:700;font-family:monospace;color:#00f088">' + esc(oi_d.get("top_pe_strike","—")) + '</div>',
     '<div style="font-size:10px;color:#7a9cbf;margin-top:4px">Support</div>',
     '</div></div></div>',
     '<div class="card"><div style="font-size:9px;color:#2a3d58;font-weight:700;text-transform:uppercase;letter-spacing:0.8px;margin-bottom:10px">Breaking News</div>',
-    news_items(data.get("news",[])),
+    '<div id="news-list">' + news_items(data.get("news",[])) + '</div>',
     '</div></div>',
 
     perspectives_section(data),
@@ -3,14 +3,30 @@ Nifty Brief — Instagram & Facebook Auto-Poster
 Posts TWO cards: main brief + 3-perspective analysis
 """
 
-import os, json, urllib.request, urllib.parse, base64, time, re
+import os, sys, json, urllib.request, urllib.error, urllib.parse, time, re, hashlib, threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
-from card_generator import generate_card, generate_perspective_card
+from card_generator import render_batch, ENCODE_STATS, ENCODE_PROFILES
 
 META_ACCESS_TOKEN     = os.environ["META_ACCESS_TOKEN"]
 INSTAGRAM_ACCOUNT_ID  = os.environ["INSTAGRAM_ACCOUNT_ID"]
 FACEBOOK_PAGE_ID      = os.environ["FACEBOOK_PAGE_ID"]
 IMGBB_API_KEY         = os.environ["IMGBB_API_KEY"]
+IMGBB_UPLOAD_URL      = os.environ.get("IMGBB_UPLOAD_URL", "https://api.imgbb.com/1/upload")
+GRAPH_URL             = os.environ.get("GRAPH_API_URL", "https://graph.facebook.com/v18.0/")
+IG_READY_TIMEOUT      = float(os.environ.get("IG_READY_TIMEOUT", "120"))   # max wait for a container
+IG_CAROUSEL           = os.environ.get("IG_CAROUSEL", "").lower() in ("1", "true", "yes")   # both cards in one post
+
+# Instagram feed images are capped at 8 MB (JPEG is its documented format; the
+# PNG cards posted so far were accepted). Of these encoder profiles the one that
+# is cheapest to encode + upload within the cap is used; set CARD_PROFILES=jpeg
+# to force JPEG.
+CARD_PROFILES  = tuple(os.environ.get("CARD_PROFILES", "jpeg,png_fast").split(","))
+META_MAX_BYTES = 8 * 1024 * 1024
+
+STATE_DIR        = os.environ.get("STATE_DIR", ".cache")
+UPLOAD_CACHE     = os.path.join(STATE_DIR, "uploads.json")
+UPLOAD_CACHE_TTL = float(os.environ.get("UPLOAD_CACHE_TTL", str(7*24*3600)))   # seconds a hosted URL is reused
 
 IST     = timezone(timedelta(hours=5, minutes=30))
 now_ist = datetime.now(IST)
@@ -25,7 +41,6 @@ def get_session():
     if t < 15*60+15: return "session_3"
     return "closing"
 
-SESSION = get_session()
 SESSION_NAMES = {
     "morning_brief":"Morning Brief","session_1":"Market Open",
     "session_2":"Mid-Morning","session_3":"Post-Lunch","closing":"Pre-Close"
@@ -35,38 +50,242 @@ print("Loading market data...")
 with open("data.json") as f:
     data = json.load(f)
 
-def upload_image(path, name):
-    print("Uploading: " + name)
-    with open(path,"rb") as f:
-        b64 = base64.b64encode(f.read()).decode()
-    payload = urllib.parse.urlencode({"key":IMGBB_API_KEY,"image":b64,"name":name}).encode()
-    req = urllib.request.Request("https://api.imgbb.com/1/upload",data=payload,method="POST")
+# The run is identified by the data it posts, not the clock: a retry that lands
+# after a session boundary (or midnight) still resumes the same journal.
+SESSION = data.get("session") or get_session()
+try:
+    DATA_DAY = datetime.strptime(data.get("updated_date", ""), "%A, %d %B %Y").strftime("%Y%m%d")
+except ValueError:
+    DATA_DAY = now_ist.strftime("%Y%m%d")
+
+def upload_image(card, name):
+    """Upload an encoded card ((profile, bytes) from render_batch) to imgbb.
+
+    The body is sent as multipart parts straight from the encoded buffer: no
+    temp file, no base64 copy. The API key goes in the query string.
+    """
+    profile, img = card
+    fmt, ext, _ = ENCODE_PROFILES[profile]
+    print("Uploading: " + name + ext + " (" + str(len(img)//1024) + " KB)")
+    boundary = "----niftybrief" + os.urandom(12).hex()
+    head = (
+        "--" + boundary + "\r\n"
+        'Content-Disposition: form-data; name="name"\r\n\r\n' + name + "\r\n"
+        "--" + boundary + "\r\n"
+        'Content-Disposition: form-data; name="image"; filename="' + name + ext + '"\r\n'
+        "Content-Type: image/" + fmt.lower() + "\r\n\r\n"
+    ).encode()
+    tail = ("\r\n--" + boundary + "--\r\n").encode()
+    body = (head, memoryview(img), tail)
+    req  = urllib.request.Request(
+        IMGBB_UPLOAD_URL + "?key=" + urllib.parse.quote(IMGBB_API_KEY), data=body, method="POST",
+        headers={"Content-Type":   "multipart/form-data; boundary=" + boundary,
+                 "Content-Length": str(sum(len(p) for p in body))})
     with urllib.request.urlopen(req,timeout=30) as r:
         return json.loads(r.read())["data"]["url"]
 
+# ── UPLOAD CACHE ──────────────────────────────────────────────────────────────
+# sha256 of the encoded card -> {"url", "ts"}; kept in .cache, which the
+# workflow carries between runs, so an identical card is never uploaded twice.
+def load_upload_cache():
+    try:
+        with open(UPLOAD_CACHE) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    now = time.time()
+    return {h: e for h, e in cache.items() if now - e.get("ts", 0) < UPLOAD_CACHE_TTL}
+
+def save_upload_cache(cache):
+    try:
+        os.makedirs(os.path.dirname(UPLOAD_CACHE) or ".", exist_ok=True)
+        with open(UPLOAD_CACHE + ".tmp", "w") as f:
+            json.dump(cache, f, indent=1)
+        os.replace(UPLOAD_CACHE + ".tmp", UPLOAD_CACHE)
+    except OSError as e:
+        print("Upload cache not written: " + str(e))
+
+upload_cache = load_upload_cache()
+upload_lock  = threading.Lock()   # uploads run in parallel threads
+
+def hosted_url(card, name):
+    """URL of the card on imgbb, uploading only when this exact content is not cached."""
+    digest = hashlib.sha256(card[1]).hexdigest()
+    hit    = upload_cache.get(digest)
+    if hit:
+        print("Upload cache hit: " + name + " -> " + hit["url"])
+        return hit["url"]
+    url = upload_image(card, name)
+    with upload_lock:
+        upload_cache[digest] = {"url": url, "ts": time.time()}
+        save_upload_cache(upload_cache)
+    return url
+
+# ── GRAPH API ─────────────────────────────────────────────────────────────────
+def graph(path, params, method="POST"):
+    params = dict(params, access_token=META_ACCESS_TOKEN)
+    q      = urllib.parse.urlencode(params)
+    if method == "GET":
+        req = urllib.request.Request(GRAPH_URL + path + "?" + q)
+    else:
+        req = urllib.request.Request(GRAPH_URL + path, data=q.encode(), method=method)
+    with urllib.request.urlopen(req,timeout=30) as r:
+        return json.loads(r.read())
+
+def ig_create(image_url, caption):
+    return graph(INSTAGRAM_ACCOUNT_ID+"/media", {"image_url":image_url,"caption":caption})["id"]
+
+def ig_wait(cid):
+    """Poll the container until Instagram has fetched and processed the image."""
+    delay, deadline = 1.0, time.time() + IG_READY_TIMEOUT
+    while True:
+        status = graph(cid, {"fields":"status_code"}, method="GET").get("status_code")
+        if status in ("FINISHED", "PUBLISHED"):
+            return cid
+        if status in ("ERROR", "EXPIRED"):
+            raise RuntimeError("container " + cid + " " + status)
+        if time.time() + delay > deadline:
+            raise TimeoutError("container " + cid + " still " + str(status))
+        time.sleep(delay)
+        delay = min(delay*2, 8)
+
+def ig_publish(cid):
+    return graph(INSTAGRAM_ACCOUNT_ID+"/media_publish", {"creation_id":cid}).get("id")
+
 def ig_post(image_url, caption):
-    base = "https://graph.facebook.com/v18.0/"
-    p1 = urllib.parse.urlencode({"image_url":image_url,"caption":caption,"access_token":META_ACCESS_TOKEN}).encode()
-    req1 = urllib.request.Request(base+INSTAGRAM_ACCOUNT_ID+"/media",data=p1,method="POST")
-    with urllib.request.urlopen(req1,timeout=30) as r:
-        cid = json.loads(r.read()).get("id")
-    p2 = urllib.parse.urlencode({"creation_id":cid,"access_token":META_ACCESS_TOKEN}).encode()
-    req2 = urllib.request.Request(base+INSTAGRAM_ACCOUNT_ID+"/media_publish",data=p2,method="POST")
-    with urllib.request.urlopen(req2,timeout=30) as r:
-        return json.loads(r.read()).get("id")
+    return ig_publish(ig_wait(ig_create(image_url, caption)))
 
 def fb_post(image_url, caption):
-    base = "https://graph.facebook.com/v18.0/"
-    p = urllib.parse.urlencode({"url":image_url,"caption":caption,"access_token":META_ACCESS_TOKEN}).encode()
-    req = urllib.request.Request(base+FACEBOOK_PAGE_ID+"/photos",data=p,method="POST")
-    with urllib.request.urlopen(req,timeout=30) as r:
-        return json.loads(r.read()).get("id")
+    return graph(FACEBOOK_PAGE_ID+"/photos", {"url":image_url,"caption":caption}).get("id")
 
-# ── CARD 1: Main Market Brief ─────────────────────────────────────────────────
-print("Generating main card...")
-generate_card(data, SESSION, "nifty_card.png")
-img_url = upload_image("nifty_card.png", "nifty_brief_"+now_ist.strftime("%Y%m%d_%H%M"))
+failures = []
+
+def report(label, fn, *args):
+    try:
+        print(label + ": SUCCESS - " + str(fn(*args)))
+    except Exception as e:
+        print(label + " ERROR: " + str(e))
+        failures.append(label)
+
+# ── JOURNAL ───────────────────────────────────────────────────────────────────
+# Completed steps of this session's posting run (upload URLs, IG container and
+# media ids, FB ids), written after every step. A rerun of the same session
+# skips what is recorded and resumes at the first unfinished step, so a retry
+# never re-uploads or double-posts to a platform that already succeeded.
+JOURNAL_DIR  = os.path.join(STATE_DIR, "journal")
+journal_path = os.path.join(JOURNAL_DIR, DATA_DAY + "_" + re.sub(r"[^\w-]", "_", SESSION) + ".json")
+journal_lock = threading.Lock()
 
+def load_journal():
+    try:
+        for name in os.listdir(JOURNAL_DIR):   # older sessions are never resumed
+            path = os.path.join(JOURNAL_DIR, name)
+            if time.time() - os.path.getmtime(path) > 3*24*3600:
+                os.remove(path)
+        with open(journal_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+journal = load_journal()
+if journal:
+    print("Resuming from journal (" + str(len(journal)) + " steps done): " + journal_path)
+
+def record(name, value):
+    with journal_lock:
+        if value is None:
+            journal.pop(name, None)
+        else:
+            journal[name] = value
+        try:
+            os.makedirs(JOURNAL_DIR, exist_ok=True)
+            with open(journal_path + ".tmp", "w") as f:
+                json.dump(journal, f, indent=1)
+            os.replace(journal_path + ".tmp", journal_path)
+        except OSError as e:
+            print("Journal not written: " + str(e))
+
+def step(name, fn, *args):
+    """Result of a journalled step: recorded value, or run fn and record it."""
+    if journal.get(name) is not None:
+        print("Journal: " + name + " already done")
+        return journal[name]
+    value = fn(*args)
+    record(name, value)
+    return value
+
+def ig_ready(name, create):
+    """Container id for a journalled step, once it is ready to publish. A
+    container left over from an earlier run may have expired (they last 24 h)
+    or failed, and the status poll either reports that or rejects the id
+    outright; then it is dropped and created afresh."""
+    resumed = journal.get(name) is not None
+    try:
+        return ig_wait(step(name, create))
+    except (RuntimeError, urllib.error.HTTPError):
+        if not resumed:
+            raise
+        record(name, None)
+        return ig_wait(step(name, create))
+
+def publish_instagram(posts):
+    """Containers for every card are created and polled in parallel; publishing
+    then goes card by card so the feed keeps the intended order."""
+    def prepare(key, url, cap):
+        if journal.get("ig:" + key + ":media"):
+            return None
+        return ig_ready("ig:" + key + ":container", lambda: ig_create(url.result(), cap))
+    with ThreadPoolExecutor(max_workers=len(posts)) as ex:
+        ready = [ex.submit(prepare, key, url, cap) for _, key, url, cap in posts]
+        for (label, key, _, _), fut in zip(posts, ready):
+            report("Instagram " + label, lambda: step("ig:" + key + ":media", lambda: ig_publish(fut.result())))
+
+def publish_facebook(posts):
+    for label, key, url, cap in posts:
+        report("Facebook " + label, lambda: step("fb:" + key, lambda: fb_post(url.result(), cap)))
+
+def ig_carousel(posts, caption):
+    """One carousel post: child containers created and polled in parallel,
+    then a single CAROUSEL container and a single publish."""
+    if journal.get("ig:carousel:media"):
+        return journal["ig:carousel:media"]
+    def child(post):
+        _, key, url, _ = post
+        return ig_ready("ig:carousel:" + key, lambda: graph(INSTAGRAM_ACCOUNT_ID+"/media",
+                        {"image_url":url.result(),"is_carousel_item":"true"})["id"])
+    with ThreadPoolExecutor(max_workers=len(posts)) as ex:
+        children = list(ex.map(child, posts))
+    cid = ig_ready("ig:carousel:container", lambda: graph(INSTAGRAM_ACCOUNT_ID+"/media",
+                   {"media_type":"CAROUSEL","children":",".join(children),"caption":caption})["id"])
+    return step("ig:carousel:media", ig_publish, cid)
+
+def fb_multi_photo(posts, caption):
+    """Facebook's equivalent: unpublished photos attached to one feed post."""
+    if journal.get("fb:multi"):
+        return journal["fb:multi"]
+    def photo(post):
+        _, key, url, _ = post
+        return step("fb:photo:" + key, lambda: graph(FACEBOOK_PAGE_ID+"/photos",
+                    {"url":url.result(),"published":"false"})["id"])
+    with ThreadPoolExecutor(max_workers=len(posts)) as ex:
+        ids = list(ex.map(photo, posts))
+    params = {"message": caption}
+    for i, fbid in enumerate(ids):
+        params["attached_media[" + str(i) + "]"] = json.dumps({"media_fbid": fbid})
+    return step("fb:multi", lambda: graph(FACEBOOK_PAGE_ID+"/feed", params).get("id"))
+
+# ── RENDER ────────────────────────────────────────────────────────────────────
+# Cards whose upload is already journalled are not rendered again.
+templates = ["main"] + (["perspectives"] if data.get("perspectives") else [])
+targets   = [(t, "feed") for t in templates if not journal.get("upload:" + t)]
+cards     = {}
+if targets:
+    print("Generating " + str(len(targets)) + " card(s)...")
+    cards = render_batch(data, SESSION, targets, out_dir=None, profile=CARD_PROFILES, max_bytes=META_MAX_BYTES)
+    for prof, st in ENCODE_STATS.items():
+        print("  encode " + prof + ": " + str(st["ms"]) + " ms, " + str(st["bytes"]//1024) + " KB")
+
+# ── CARD 1: Main Market Brief ─────────────────────────────────────────────────
 n       = data.get("nifty",{})
 s       = data.get("sentiment",{})
 g       = data.get("gift",{})
@@ -82,25 +301,23 @@ for item in news:
     sym = "UP" if item.get("impact")=="positive" else "DOWN" if item.get("impact")=="negative" else "-"
     news_lines += "[" + sym + "] " + item.get("headline","") + "\n"
 
-caption1 = (
+brief_text = (
     emoji_s + " NIFTY " + SESSION_NAMES.get(SESSION,"UPDATE") + " | " + DATE + "\n\n"
     "Nifty 50: " + str(n.get("price","")) + " (" + str(n.get("change","")) + ")\n"
     "Gift Nifty Gap: " + str(g.get("gap_pts","")) + " pts (" + emoji_g + ")\n"
     "Sentiment: " + str(s.get("label","")) + " " + str(score) + "/100\n\n"
     "KEY NEWS:\n" + news_lines.strip() + "\n\n"
     "TRADING VERDICT:\n" + verdict + "\n\n"
+)
+brief_tags = (
     "Full dashboard: sameerxceed.github.io/nifty-dashboard\n\n"
     "#Nifty50 #StockMarket #NSE #TradingIndia #NiftyLive #MarketBrief\n"
     "#IndianStockMarket #Sensex #Trading #OptionsTrading #TechnicalAnalysis"
 )
+caption1 = brief_text + brief_tags
 
 # ── CARD 2: 3-Perspective Analysis ───────────────────────────────────────────
-persp_url = None
 if data.get("perspectives"):
-    print("Generating perspectives card...")
-    generate_perspective_card(data, SESSION, "nifty_perspectives.png")
-    persp_url = upload_image("nifty_perspectives.png", "nifty_persp_"+now_ist.strftime("%Y%m%d_%H%M"))
-
     persp = data["perspectives"]
     caption2 = (
         "3 VIEWS ON TODAY'S KEY EVENT\n\n"
@@ -113,33 +330,38 @@ if data.get("perspectives"):
         "#IndianStockMarket #NiftyLive #MarketViews #StockMarket"
     )
 
-# ── POST BOTH ─────────────────────────────────────────────────────────────────
-for label, url, cap in [
-    ("Instagram Card 1", img_url, caption1),
-    ("Facebook Card 1",  img_url, caption1),
-]:
-    try:
-        if "Instagram" in label:
-            pid = ig_post(url, cap)
+# ── UPLOAD + POST ─────────────────────────────────────────────────────────────
+# Both uploads run at once; Instagram and Facebook each get their own thread and
+# start on a card as soon as its upload resolves.
+stamp = now_ist.strftime("%Y%m%d_%H%M")
+labels = {"main": ("Card 1", "nifty_brief_", caption1)}
+if data.get("perspectives"):
+    labels["perspectives"] = ("Perspectives", "nifty_persp_", caption2)
+with ThreadPoolExecutor(max_workers=2) as uploads:
+    posts = []
+    for key in templates:
+        label, prefix, cap = labels[key]
+        url = uploads.submit(step, "upload:" + key, hosted_url, cards.get((key, (1080, 1080))), prefix+stamp)
+        posts.append((label, key, url, cap))
+    with ThreadPoolExecutor(max_workers=2) as platforms:
+        if IG_CAROUSEL and len(posts) > 1:
+            caption = (brief_text + "SWIPE FOR BULL / NEUTRAL / BEAR VIEWS ON:\n"
+                       + str(persp.get("key_event","")) + "\n\n" + brief_tags)
+            runs = [("Instagram", platforms.submit(report, "Instagram Carousel", ig_carousel, posts, caption)),
+                    ("Facebook",  platforms.submit(report, "Facebook Multi-photo", fb_multi_photo, posts, caption))]
         else:
-            pid = fb_post(url, cap)
-        print(label + ": SUCCESS - " + str(pid))
-    except Exception as e:
-        print(label + " ERROR: " + str(e))
-
-if persp_url:
-    time.sleep(6)
-    for label, url, cap in [
-        ("Instagram Perspectives", persp_url, caption2),
-        ("Facebook Perspectives",  persp_url, caption2),
-    ]:
+            runs = [("Instagram", platforms.submit(publish_instagram, posts)),
+                    ("Facebook",  platforms.submit(publish_facebook, posts))]
+    # report() catches per-post errors; anything else a platform thread raised
+    # would otherwise vanish with its future.
+    for label, fut in runs:
         try:
-            if "Instagram" in label:
-                pid = ig_post(url, cap)
-            else:
-                pid = fb_post(url, cap)
-            print(label + ": SUCCESS - " + str(pid))
+            fut.result()
         except Exception as e:
             print(label + " ERROR: " + str(e))
+            failures.append(label)
 
+if failures:
+    print("Failed: " + ", ".join(failures) + " (" + TIME + ")")
+    sys.exit(1)
 print("All done! " + TIME)
@@ -0,0 +1,189 @@
+"""
+Nifty Live — Quote Fan-out Proxy
+Fetches the quotes API once per interval, keeps the latest response in memory
+and pushes it to every open dashboard tab over Server-Sent Events.
+
+  python quote_proxy.py                                   # proxy the live API
+  QUOTES_UPSTREAM=http://127.0.0.1:9000/quotes \\
+  PROXY_INTERVAL=2 python quote_proxy.py                  # against a local stub
+
+Endpoints:
+  GET /stream   text/event-stream, one "quotes" event per upstream change
+  GET /quotes   latest cached response (refetched when older than the TTL)
+  GET /health   clients connected, cache age and the last upstream error
+
+While upstream fails, retries back off from PROXY_RETRY seconds up to the poll
+interval, and responses older than the TTL carry "stale": true, their "age"
+and the upstream "error".
+"""
+
+import os, json, time, asyncio, urllib.request
+
+# ── CONFIG ────────────────────────────────────────────────────────────────────
+UPSTREAM_URL  = os.environ.get("QUOTES_UPSTREAM", "https://nifty-api.vercel.app/api/quotes")
+HOST          = os.environ.get("PROXY_HOST", "0.0.0.0")
+PORT          = int(os.environ.get("PROXY_PORT", "8787"))
+POLL_INTERVAL = float(os.environ.get("PROXY_INTERVAL", "60"))   # seconds between upstream fetches
+CACHE_TTL     = float(os.environ.get("PROXY_TTL", "90"))        # max age served from /quotes
+RETRY_MIN     = float(os.environ.get("PROXY_RETRY", "5"))       # first retry after an upstream failure
+HEARTBEAT     = 15                                              # SSE keep-alive comment interval
+ALLOW_ORIGIN  = os.environ.get("PROXY_ALLOW_ORIGIN", "*")
+
+# ── SHARED STATE ──────────────────────────────────────────────────────────────
+latest  = {"payload": None, "ts": 0.0,   # compact JSON string of the last good response
+           "error": None, "fails": 0, "retry_at": 0.0}
+clients = set()                          # one asyncio.Queue per connected SSE client
+app_tasks = set()                        # background tasks, referenced until done so they are not collected
+refresh_lock = None
+
+def spawn(coro):
+    task = asyncio.create_task(coro)
+    app_tasks.add(task)
+    task.add_done_callback(app_tasks.discard)
+    return task
+
+def fetch_upstream():
+    req = urllib.request.Request(UPSTREAM_URL, headers={"User-Agent": "nifty-quote-proxy"})
+    with urllib.request.urlopen(req, timeout=15) as r:
+        body = json.loads(r.read())
+    if not body.get("quotes"):
+        raise ValueError("upstream returned no quotes")
+    return json.dumps(body, separators=(",",":"))
+
+def served():
+    """The cached payload, marked stale once it is older than the TTL."""
+    age = time.time() - latest["ts"]
+    if age < CACHE_TTL:
+        return latest["payload"]
+    body = json.loads(latest["payload"])
+    body.update({"stale": True, "age": round(age), "error": latest["error"]})
+    return json.dumps(body, separators=(",",":"))
+
+def publish(payload):
+    for q in list(clients):
+        if q.full():
+            q.get_nowait()   # slow client: drop the stale update, keep only the newest
+        q.put_nowait(payload)
+
+async def refresh():
+    """Fetch upstream once; concurrent callers share the same fetch. After a
+    failure nobody retries before retry_at, whatever the cache age."""
+    async with refresh_lock:
+        now = time.time()
+        if now - latest["ts"] < 1 or now < latest["retry_at"]:
+            return
+        try:
+            payload = await asyncio.to_thread(fetch_upstream)
+        except Exception as e:
+            latest["fails"] += 1
+            latest["error"]    = str(e)[:200]
+            latest["retry_at"] = time.time() + min(RETRY_MIN * 2**(latest["fails"]-1), max(POLL_INTERVAL, RETRY_MIN))
+            print("Upstream error (" + str(latest["fails"]) + " in a row): " + latest["error"][:100])
+            if latest["payload"] and time.time() - latest["ts"] >= CACHE_TTL:
+                publish(served())   # let SSE clients know they are looking at old quotes
+            return
+        latest["fails"], latest["error"], latest["retry_at"] = 0, None, 0.0
+        changed = payload != latest["payload"]
+        latest["payload"], latest["ts"] = payload, time.time()
+        if changed:
+            publish(payload)
+
+async def poller():
+    # Upstream is only polled while someone is listening; /quotes refreshes on demand.
+    while True:
+        if clients:
+            await refresh()
+        await asyncio.sleep(POLL_INTERVAL)
+
+# ── HTTP ──────────────────────────────────────────────────────────────────────
+def head(status, ctype, extra=""):
+    return (
+        "HTTP/1.1 " + status + "\r\n"
+        "Content-Type: " + ctype + "\r\n"
+        "Cache-Control: no-store\r\n"
+        "Access-Control-Allow-Origin: " + ALLOW_ORIGIN + "\r\n"
+        + extra + "\r\n"
+    ).encode()
+
+async def send_json(writer, status, body):
+    data = body.encode()
+    writer.write(head(status, "application/json",
+                      "Content-Length: " + str(len(data)) + "\r\nConnection: close\r\n") + data)
+    await writer.drain()
+
+async def serve_stream(writer):
+    q = asyncio.Queue(maxsize=1)
+    clients.add(q)
+    print("SSE client connected (" + str(len(clients)) + " open)")
+    try:
+        writer.write(head("200 OK", "text/event-stream", "Connection: keep-alive\r\n") + b"retry: 5000\n\n")
+        if latest["payload"]:
+            q.put_nowait(served())
+        if time.time() - latest["ts"] >= CACHE_TTL and len(clients) == 1:
+            spawn(refresh())
+        while True:
+            try:
+                payload = await asyncio.wait_for(q.get(), HEARTBEAT)
+                writer.write(("event: quotes\ndata: " + payload + "\n\n").encode())
+            except asyncio.TimeoutError:
+                writer.write(b": ping\n\n")
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        clients.discard(q)
+        print("SSE client left (" + str(len(clients)) + " open)")
+
+async def handle(reader, writer):
+    try:
+        line = (await reader.readline()).decode("latin-1").split()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass   # headers are not needed
+        if len(line) < 2:
+            return
+        method, path = line[0], line[1].split("?")[0]
+        if method == "OPTIONS":
+            writer.write(head("204 No Content", "text/plain",
+                              "Access-Control-Allow-Methods: GET\r\nContent-Length: 0\r\n"))
+        elif method != "GET":
+            await send_json(writer, "405 Method Not Allowed", '{"ok":false}')
+        elif path == "/stream":
+            await serve_stream(writer)
+        elif path == "/quotes":
+            if time.time() - latest["ts"] >= CACHE_TTL:
+                await refresh()
+            if latest["payload"]:
+                await send_json(writer, "200 OK", served())
+            else:
+                await send_json(writer, "502 Bad Gateway", json.dumps({"ok": False, "error": latest["error"] or "no upstream data"}))
+        elif path == "/health":
+            age = round(time.time() - latest["ts"], 1) if latest["ts"] else None
+            await send_json(writer, "200 OK", json.dumps({"ok": True, "clients": len(clients), "age": age,
+                                                         "error": latest["error"], "fails": latest["fails"]}))
+        else:
+            await send_json(writer, "404 Not Found", '{"ok":false}')
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def main():
+    global refresh_lock
+    refresh_lock = asyncio.Lock()
+    server = await asyncio.start_server(handle, HOST, PORT)
+    print("Quote proxy on http://" + HOST + ":" + str(PORT) + " <- " + UPSTREAM_URL
+          + " every " + str(POLL_INTERVAL) + "s")
+    spawn(poller())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        for task in list(app_tasks):
+            task.cancel()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
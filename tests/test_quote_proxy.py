@@ -0,0 +1,104 @@
+"""
+quote_proxy.py against a local stub upstream: /quotes, stale marking while
+upstream is down, and an SSE "quotes" event once it is back.
+
+  python -m pytest -q tests
+"""
+
+import os, sys, json, asyncio, importlib, threading, http.server
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# ── STUB UPSTREAM ─────────────────────────────────────────────────────────────
+upstream = {"price": 24350.5, "fail": False, "hits": 0}
+
+class Upstream(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        upstream["hits"] += 1
+        if upstream["fail"]:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps({"ok": True, "quotes": [{"symbol": "^NSEI", "price": upstream["price"]}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def load_proxy(upstream_port):
+    os.environ.update({"QUOTES_UPSTREAM": "http://127.0.0.1:" + str(upstream_port) + "/quotes",
+                       "PROXY_INTERVAL": "0.2", "PROXY_TTL": "1.2", "PROXY_RETRY": "0.2"})
+    import quote_proxy
+    return importlib.reload(quote_proxy)
+
+# ── HTTP CLIENT ───────────────────────────────────────────────────────────────
+async def get(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(("GET " + path + " HTTP/1.1\r\nHost: x\r\n\r\n").encode())
+    raw = await reader.read()
+    writer.close()
+    head, _, body = raw.decode().partition("\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+async def next_event(reader):
+    event = None
+    while True:
+        line = (await reader.readline()).decode().strip()
+        if line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: ") and event == "quotes":
+            return json.loads(line[6:])
+
+# ── TEST ──────────────────────────────────────────────────────────────────────
+def test_quotes_stale_and_stream():
+    stub = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    qp = load_proxy(stub.server_address[1])
+
+    async def scenario():
+        qp.refresh_lock = asyncio.Lock()
+        server = await asyncio.start_server(qp.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        qp.spawn(qp.poller())
+        try:
+            status, body = await get(port, "/quotes")
+            assert status == 200
+            assert body["quotes"][0]["price"] == 24350.5
+            assert "stale" not in body
+
+            upstream["fail"] = True
+            await asyncio.sleep(1.4)   # past the TTL
+            hits = upstream["hits"]
+            status, body = await get(port, "/quotes")
+            assert status == 200
+            assert body["stale"] is True
+            assert body["age"] >= 0 and "503" in body["error"]
+            status, _ = await get(port, "/quotes")
+            assert upstream["hits"] <= hits + 1   # retries back off instead of one fetch per request
+
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /stream HTTP/1.1\r\nHost: x\r\n\r\n")
+            first = await asyncio.wait_for(next_event(reader), 5)
+            assert first["stale"] is True   # the cached payload, marked stale
+            upstream["fail"], upstream["price"] = False, 24400.0
+            fresh = await asyncio.wait_for(next_event(reader), 5)
+            assert fresh["quotes"][0]["price"] == 24400.0 and "stale" not in fresh
+            writer.close()
+
+            _, health = await get(port, "/health")
+            assert health["error"] is None and health["fails"] == 0
+        finally:
+            server.close()
+            for task in list(qp.app_tasks):
+                task.cancel()
+            await asyncio.sleep(0)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        stub.shutdown()
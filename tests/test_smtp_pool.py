@@ -0,0 +1,124 @@
+"""
+broadcast.py's SmtpPool and TokenBucket against a local SMTP stand-in:
+session reuse, reconnect after the server drops a session, and the send rate.
+
+  python -m pytest -q tests
+"""
+
+import os, ast, time, smtplib, threading, socketserver
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+def load(*names):
+    """Just the named classes from broadcast.py: importing it runs the broadcast."""
+    path = os.path.join(ROOT, "broadcast.py")
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    body = [n for n in tree.body if isinstance(n, ast.ClassDef) and n.name in names]
+    ns   = {"smtplib": smtplib, "threading": threading, "time": time}
+    exec(compile(ast.Module(body=body, type_ignores=[]), path, "exec"), ns)
+    return ns
+
+bc = load("SmtpPool", "TokenBucket")
+
+# ── STUB SMTP SERVER ──────────────────────────────────────────────────────────
+class Smtp(socketserver.StreamRequestHandler):
+    """Accepts everything; hangs up at the next MAIL once a session has carried
+    server.drop_after messages, the way an idle-timed-out session looks."""
+
+    def handle(self):
+        stats = self.server.stats
+        stats["sessions"] += 1
+        sent  = 0
+        reply = lambda line: self.wfile.write((line + "\r\n").encode())
+        reply("220 stub")
+        while True:
+            cmd = self.rfile.readline().decode().strip().upper()
+            if not cmd:
+                return
+            if cmd.startswith("MAIL") and self.server.drop_after and sent >= self.server.drop_after:
+                stats["drops"] += 1
+                return
+            if cmd == "DATA":
+                reply("354 go")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                sent += 1
+                stats["messages"].append(time.monotonic())
+                reply("250 queued")
+            elif cmd == "QUIT":
+                reply("221 bye")
+                return
+            else:
+                reply("250 ok")
+
+def serve(drop_after=0):
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Smtp)
+    server.daemon_threads = True
+    server.drop_after     = drop_after
+    server.stats          = {"sessions": 0, "drops": 0, "messages": []}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def pool_for(server, **kw):
+    return bc["SmtpPool"]("127.0.0.1", server.server_address[1], False, "a@b.c", "", **kw)
+
+MESSAGE = "Subject: test\r\n\r\nhello\r\n"
+
+# ── TESTS ─────────────────────────────────────────────────────────────────────
+def test_reuses_one_session():
+    server = serve()
+    pool   = pool_for(server)
+    try:
+        for i in range(5):
+            pool.send("a@b.c", "sub" + str(i) + "@x.com", MESSAGE)
+        pool.close()
+        assert pool.opened == 1
+        assert server.stats["sessions"] == 1
+        assert len(server.stats["messages"]) == 5
+    finally:
+        server.shutdown()
+
+def test_retires_session_after_max_per_conn():
+    server = serve()
+    pool   = pool_for(server, max_per_conn=2)
+    try:
+        for i in range(5):
+            pool.send("a@b.c", "sub" + str(i) + "@x.com", MESSAGE)
+        pool.close()
+        assert pool.opened == 3 and server.stats["sessions"] == 3
+        assert len(server.stats["messages"]) == 5
+    finally:
+        server.shutdown()
+
+def test_reconnects_after_server_drop():
+    server = serve(drop_after=2)
+    pool   = pool_for(server)
+    try:
+        for i in range(5):
+            pool.send("a@b.c", "sub" + str(i) + "@x.com", MESSAGE)   # no exception reaches the caller
+        pool.close()
+        assert server.stats["drops"] == 2
+        assert pool.opened == 3
+        assert len(server.stats["messages"]) == 5
+    finally:
+        server.shutdown()
+
+def test_token_bucket_limits_send_rate():
+    server = serve()
+    pool   = pool_for(server)
+    bucket = bc["TokenBucket"](rate=20, burst=2)
+    try:
+        t0 = time.monotonic()
+        for i in range(10):
+            bucket.acquire()
+            pool.send("a@b.c", "sub" + str(i) + "@x.com", MESSAGE)
+        elapsed = time.monotonic() - t0
+        pool.close()
+        stamps = server.stats["messages"]
+        assert len(stamps) == 10
+        assert elapsed >= (10-2)/20 * 0.9   # the burst goes out at once, the rest at 20/s
+        assert stamps[-1] - stamps[2] >= (10-3)/20 * 0.9
+        assert elapsed < 2
+    finally:
+        server.shutdown()